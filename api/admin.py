@@ -2,7 +2,16 @@ from django.contrib import admin
 from django.utils.translation import gettext as _
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
-from .models import Game, HighScore, User, UserProfile
+from .models import (
+    Game,
+    GameAnalysis,
+    HighScore,
+    MatchRequest,
+    Move,
+    RequestProfile,
+    User,
+    UserProfile,
+)
 
 
 class UserProfileInline(admin.StackedInline):
@@ -47,3 +56,7 @@ class UserAdmin(BaseUserAdmin):
 admin.site.register(UserProfile)
 admin.site.register(HighScore)
 admin.site.register(Game)
+admin.site.register(Move)
+admin.site.register(GameAnalysis)
+admin.site.register(RequestProfile)
+admin.site.register(MatchRequest)
@@ -0,0 +1,3 @@
+"""
+Benchmarks runnable with `python -m api.benchmarks.<name>`.
+"""
@@ -0,0 +1,289 @@
+"""
+End-to-end load benchmark of the REST API. Every flow registers two users,
+creates a game, plays it to the end with PATCH requests and reads the
+dashboard. Flows run concurrently and latency percentiles and database
+queries are reported per endpoint, then written as JSON to diff between
+commits.
+
+    python -m api.benchmarks.api --flows 50 --concurrency 4 --output bench.json
+
+By default requests go through Django test client against a fresh test
+database. With `--url` they're sent to a running server instead, which has
+to use the same database: players' profiles are created directly, as the
+API has no endpoint for them, and queries can't be counted.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from django.db import connection, connections  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from api.engine import Board  # noqa: E402
+from api.models import UserProfile  # noqa: E402
+
+PASSWORD = "benchmark-Pa55word"
+
+# status, parsed body and number of queries (None when not known)
+Result = Tuple[int, Optional[dict], Optional[int]]
+
+
+class TestClientTransport:
+    """Requests through Django test client, in process, counting queries."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, data=None, token=None) -> Result:
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = Client()
+        extra = {"HTTP_AUTHORIZATION": "Bearer " + token} if token else {}
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, method)(
+                path,
+                data=json.dumps(data) if data is not None else None,
+                content_type="application/json",
+                **extra,
+            )
+        body = response.json() if response.content else None
+        return response.status_code, body, len(queries)
+
+
+class HttpTransport:
+    """Requests to a running server."""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+
+    def request(self, method: str, path: str, data=None, token=None) -> Result:
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = "Bearer " + token
+        request = urllib.request.Request(
+            self.url + path,
+            data=json.dumps(data).encode() if data is not None else None,
+            headers=headers,
+            method=method.upper(),
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                status, content = response.status, response.read()
+        except urllib.error.HTTPError as error:
+            status, content = error.code, error.read()
+        return status, json.loads(content) if content else None, None
+
+
+class Recorder:
+    """Latencies, queries and statuses of requests per endpoint, thread safe."""
+
+    def __init__(self, transport):
+        self.transport = transport
+        # latency, queries and status of every request per endpoint
+        self.samples: Dict[str, List[Tuple[float, Optional[int], int]]]
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def request(self, endpoint: str, method: str, path: str, data=None, token=None):
+        start = time.perf_counter()
+        status, body, queries = self.transport.request(method, path, data, token)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.samples[endpoint].append((elapsed, queries, status))
+        return status, body
+
+
+def register(recorder: Recorder) -> Tuple[int, str]:
+    """Register a user with a profile, return profile id and access token."""
+    email = "bench-{}@example.com".format(uuid.uuid4().hex)
+    status, body = recorder.request(
+        "register",
+        "post",
+        "/api/dj-rest-auth/registration/",
+        {
+            "email": email,
+            "username": email,
+            "password1": PASSWORD,
+            "password2": PASSWORD,
+        },
+    )
+    if status != 201:
+        raise RuntimeError("Registration failed: {} {}".format(status, body))
+    # not part of the API, not measured
+    profile = UserProfile.objects.create(user_id=body["user"]["pk"], title="benchmark")
+    return profile.id, body["access_token"]
+
+
+def flow(recorder: Recorder, board_size: int, seed: int) -> None:
+    try:
+        (first, token), (second, _token) = register(recorder), register(recorder)
+        status, body = recorder.request(
+            "create",
+            "post",
+            "/api/play/",
+            {"players": [first, second], "board_size": board_size},
+            token,
+        )
+        if status != 201:
+            raise RuntimeError("Game creation failed: {} {}".format(status, body))
+        path = "/api/play/{}/".format(body["id"])
+
+        # the game is followed locally to know when it ends
+        board = Board(board_size)
+        player_ids = sorted([first, second])
+        current = first
+        cells = list(range(board_size * board_size))
+        random.Random(seed).shuffle(cells)
+        for cell in cells:
+            status, body = recorder.request(
+                "move", "patch", path, {"move": cell}, token
+            )
+            if status != 200:
+                break
+            slot = player_ids.index(current)
+            board.play(slot, cell)
+            if board.winning_line(slot, cell) or board.is_full():
+                break
+            current = second if current == first else first
+
+        recorder.request("dashboard", "get", "/api/dashboard", token=token)
+    finally:
+        # connections of worker threads aren't closed by request handling
+        connections.close_all()
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    index = max(0, min(len(values) - 1, int(round(percent / 100 * len(values))) - 1))
+    return values[index]
+
+
+def summary(recorder: Recorder, elapsed: float) -> dict:
+    endpoints = {}
+    for endpoint, samples in sorted(recorder.samples.items()):
+        latencies = sorted(latency * 1000 for latency, _queries, _status in samples)
+        queries = [count for _latency, count, _status in samples if count is not None]
+        endpoints[endpoint] = {
+            "requests": len(samples),
+            "errors": sum(1 for _latency, _queries, status in samples if status >= 400),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "queries_per_request": (
+                round(sum(queries) / len(queries), 2) if queries else None
+            ),
+        }
+    requests = sum(endpoint["requests"] for endpoint in endpoints.values())
+    return {
+        "endpoints": endpoints,
+        "requests": requests,
+        "elapsed_s": round(elapsed, 2),
+        "requests_per_s": round(requests / elapsed, 1),
+    }
+
+
+def run(flows: int, concurrency: int, board_size: int, url: Optional[str]) -> dict:
+    transport = HttpTransport(url) if url else TestClientTransport()
+    recorder = Recorder(transport)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [
+            executor.submit(flow, recorder, board_size, seed) for seed in range(flows)
+        ]:
+            future.result()
+    return summary(recorder, time.perf_counter() - start)
+
+
+def print_summary(result: dict) -> None:
+    print(
+        "{:>10} {:>9} {:>7} {:>9} {:>9} {:>9} {:>8}".format(
+            "endpoint",
+            "requests",
+            "errors",
+            "p50 [ms]",
+            "p95 [ms]",
+            "p99 [ms]",
+            "queries",
+        )
+    )
+    for endpoint, stats in result["endpoints"].items():
+        queries = stats["queries_per_request"]
+        print(
+            "{:>10} {:>9} {:>7} {:>9.2f} {:>9.2f} {:>9.2f} {:>8}".format(
+                endpoint,
+                stats["requests"],
+                stats["errors"],
+                stats["p50_ms"],
+                stats["p95_ms"],
+                stats["p99_ms"],
+                "-" if queries is None else queries,
+            )
+        )
+    print(
+        "{} requests in {:.2f} s, {:.1f} requests/s".format(
+            result["requests"], result["elapsed_s"], result["requests_per_s"]
+        )
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--flows", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--board-size", type=int, default=3)
+    parser.add_argument(
+        "--url", help="base URL of a running server, e.g. http://127.0.0.1:8000"
+    )
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    settings = {
+        "flows": args.flows,
+        "concurrency": args.concurrency,
+        "board_size": args.board_size,
+        "target": args.url or "test client",
+    }
+    if args.url:
+        result = run(args.flows, args.concurrency, args.board_size, args.url)
+    else:
+        from django.test.utils import setup_test_environment
+
+        setup_test_environment()
+        # a database file, unlike shared memory, lets concurrent writers wait
+        with tempfile.TemporaryDirectory() as directory:
+            test_settings = connection.settings_dict.setdefault("TEST", {})
+            test_settings["NAME"] = os.path.join(directory, "benchmark.sqlite3")
+            old_name = connection.creation.create_test_db(verbosity=0)
+            try:
+                result = run(args.flows, args.concurrency, args.board_size, None)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    result = {"settings": settings, **result}
+    print_summary(result)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=2, sort_keys=True)
+            file.write("\n")
+
+
+if __name__ == "__main__":
+    main()
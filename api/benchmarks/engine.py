@@ -0,0 +1,65 @@
+"""
+Micro-benchmark of win detection: list based check used before the engine
+against bitboard check from `api.engine`.
+
+    python -m api.benchmarks.engine
+"""
+import argparse
+import random
+import timeit
+from typing import List
+
+from api.engine import Board, winning_lines
+
+
+def list_based_win(winning_combinations: List[List[int]], played_moves: List[int]) -> bool:
+    for combo in winning_combinations:
+        if all(item in played_moves for item in combo):
+            return True
+    return False
+
+
+def run(sizes: range, number: int, win_length: int = 0) -> None:
+    print(
+        "{:>4} {:>14} {:>14} {:>14} {:>8}".format(
+            "size", "list [us]", "bitboard [us]", "last move [us]", "speedup"
+        )
+    )
+    for size in sizes:
+        cells = list(range(size * size))
+        random.Random(size).shuffle(cells)
+        # half of the board for one player, no complete line in the worst case
+        played_moves = cells[: len(cells) // 2]
+        length = min(win_length, size) if win_length else size
+        combinations = [list(line) for line in winning_lines(size, length)]
+        board = Board.from_moves(size, [played_moves, []], length)
+
+        list_time = timeit.timeit(
+            lambda: list_based_win(combinations, played_moves), number=number
+        )
+        board_time = timeit.timeit(lambda: board.winning_line(0), number=number)
+        last_move = played_moves[-1]
+        last_move_time = timeit.timeit(
+            lambda: board.winning_line(0, last_move), number=number
+        )
+        print(
+            "{:>4} {:>14.2f} {:>14.2f} {:>14.2f} {:>7.1f}x".format(
+                size,
+                list_time / number * 1e6,
+                board_time / number * 1e6,
+                last_move_time / number * 1e6,
+                list_time / last_move_time,
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--min-size", type=int, default=3)
+    parser.add_argument("--max-size", type=int, default=15)
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument(
+        "--win-length", type=int, default=0, help="default: full length of the board"
+    )
+    args = parser.parse_args()
+    run(range(args.min_size, args.max_size + 1), args.number, args.win_length)
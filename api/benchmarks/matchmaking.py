@@ -0,0 +1,72 @@
+"""
+Latency of the in-memory matchmaking queues, see `api.matchmaking`. Queues
+are filled with the given number of waiting players, then arrivals of
+players with random ratings, bands and boards are timed one by one.
+
+    python -m api.benchmarks.matchmaking --waiting 1000 10000 100000
+"""
+import argparse
+import os
+import random
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+
+from api.matchmaking import Matchmaker  # noqa: E402
+
+BOARD_SIZES = range(3, 20)
+
+
+def player(rng: random.Random, matchmaker: Matchmaker, player_id: int):
+    size = rng.choice(BOARD_SIZES)
+    rating = max(0, int(rng.gauss(1200, 300)))
+    band = rng.choice(settings.MATCHMAKING_RATING_BANDS)
+    return (size, size), matchmaker.ticket(player_id, rating, band)
+
+
+def run(waiting_counts, arrivals: int, seed: int) -> None:
+    print(
+        "{:>8} {:>9} {:>9} {:>10} {:>10}".format(
+            "waiting", "arrivals", "matched", "mean [us]", "p99 [us]"
+        )
+    )
+    for waiting in waiting_counts:
+        rng = random.Random(seed)
+        matchmaker = Matchmaker()
+        # queued as they are, even when some of them could be matched
+        for player_id in range(waiting):
+            matchmaker._add(*player(rng, matchmaker, player_id))
+        latencies = []
+        matched = 0
+        for player_id in range(waiting, waiting + arrivals):
+            board_settings, ticket = player(rng, matchmaker, player_id)
+            start = time.perf_counter()
+            opponent = matchmaker.match(board_settings, ticket)
+            latencies.append(time.perf_counter() - start)
+            matched += opponent is not None
+        latencies.sort()
+        print(
+            "{:>8} {:>9} {:>9} {:>10.1f} {:>10.1f}".format(
+                waiting,
+                arrivals,
+                matched,
+                sum(latencies) / arrivals * 1e6,
+                latencies[int(arrivals * 0.99) - 1] * 1e6,
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--waiting", type=int, nargs="+", default=[1000, 10000, 100000]
+    )
+    parser.add_argument("--arrivals", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.waiting, args.arrivals, args.seed)
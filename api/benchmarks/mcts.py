@@ -0,0 +1,53 @@
+"""
+Throughput of Monte Carlo tree search: simulations per second per core,
+in one process and split among a pool of worker processes.
+
+    python -m api.benchmarks.mcts
+"""
+import argparse
+import os
+import time
+
+from api.engine import Board, mcts
+
+
+def opening(size: int, win_length: int) -> Board:
+    """A few moves around the center, so the tree has candidates to expand."""
+    center = size // 2 * size + size // 2
+    return Board.from_moves(size, [[center, center + 1], [center + size]], win_length)
+
+
+def run(sizes, simulations: int, workers: int, win_length: int) -> None:
+    print(
+        "{:>4} {:>8} {:>10} {:>18} {:>18}".format(
+            "size", "workers", "time [s]", "sims/s", "sims/s per core"
+        )
+    )
+    for size in sizes:
+        board = opening(size, min(win_length, size))
+        for pool_size in sorted({1, workers}):
+            if pool_size > 1:
+                # start worker processes outside of the measure
+                mcts.parallel_search(board, 1, pool_size, pool_size)
+            start = time.perf_counter()
+            mcts.parallel_search(board, 1, simulations, pool_size)
+            elapsed = time.perf_counter() - start
+            print(
+                "{:>4} {:>8} {:>10.2f} {:>18.0f} {:>18.0f}".format(
+                    size,
+                    pool_size,
+                    elapsed,
+                    simulations / elapsed,
+                    simulations / elapsed / pool_size,
+                )
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[7, 11, 15, 19])
+    parser.add_argument("--simulations", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--win-length", type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.simulations, args.workers, args.win_length)
@@ -0,0 +1,6 @@
+"""
+Pure game engine, independent from Django models and serializers.
+"""
+from api.engine.board import Board, line_masks, mask_of, winning_lines
+
+__all__ = ["Board", "line_masks", "mask_of", "winning_lines"]
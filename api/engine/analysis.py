@@ -0,0 +1,139 @@
+"""
+Post-game analysis: every move of a finished game is compared with the best
+one of its position. Boards solved exactly (3x3) get exact outcomes, bigger
+ones are judged by a shallow negamax search, where only forced wins and
+losses count as outcomes.
+
+Moves are independent jobs, so they're evaluated in the shared process pool,
+all moves of many games together.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+from api.engine.board import winning_run
+from api.engine.pool import pool_map
+from api.engine.search import (
+    EXACT_SEARCH_CELLS,
+    INFINITY,
+    WIN_SCORE,
+    Negamax,
+    exact_search,
+)
+
+WIN, DRAW, LOSS = "win", "draw", "loss"
+MISTAKE, BLUNDER = "mistake", "blunder"
+
+# moves of a game as (player slot, cell), in order of play
+History = Sequence[Tuple[int, int]]
+
+
+def _outcome(score: int, exact: bool) -> Optional[str]:
+    if score >= WIN_SCORE:
+        return WIN
+    if score <= -WIN_SCORE:
+        return LOSS
+    # heuristic scores don't tell a draw
+    return DRAW if exact else None
+
+
+def evaluate_move(
+    size: int,
+    win_length: int,
+    masks: Tuple[int, int],
+    player: int,
+    cell: int,
+    depth: int,
+) -> Tuple[int, Optional[str], Optional[str]]:
+    """
+    Return the best cell of the position before the move, the outcome it
+    leads to and the outcome of the played cell, for the player in given slot.
+    """
+    me, opponent = masks[player], masks[1 - player]
+    empty_cells = size * size - bin(me | opponent).count("1")
+    if size * size <= EXACT_SEARCH_CELLS:
+        search = exact_search(size, win_length)
+        depth = empty_cells
+    else:
+        search = Negamax(size, win_length)
+        depth = min(depth, empty_cells)
+    # searched to the end of the game, scores are exact
+    exact = depth == empty_cells
+    best_cell, best_score = search.best_move(me, opponent, depth)
+
+    played = me | 1 << cell
+    if winning_run(size, win_length, played, cell) is not None:
+        played_score = WIN_SCORE
+    elif empty_cells == 1:
+        played_score = 0
+    else:
+        played_score = -search.search(opponent, played, depth - 1, -INFINITY, INFINITY)
+    return best_cell, _outcome(best_score, exact), _outcome(played_score, exact)
+
+
+def judge(best: Optional[str], played: Optional[str]) -> Optional[str]:
+    """A move losing a won or drawn game is a blunder, missing a win a mistake."""
+    if played == best:
+        return None
+    if played == LOSS:
+        return BLUNDER
+    if best == WIN:
+        return MISTAKE
+    return None
+
+
+def analyse_games(
+    size_settings: Sequence[Tuple[int, int]],
+    histories: Sequence[History],
+    depth: int = 2,
+    workers: Optional[int] = None,
+) -> List[dict]:
+    """
+    Analyse games given their `(board_size, win_length)` and histories.
+    Return per game the moves with the best alternative, the judgement of
+    the played move and `decided_at`, the ply from which the result didn't
+    change any more.
+    """
+    jobs = []
+    for (size, win_length), history in zip(size_settings, histories):
+        masks = [0, 0]
+        for player, cell in history:
+            jobs.append((size, win_length, tuple(masks), player, cell, depth))
+            masks[player] |= 1 << cell
+    evaluations = iter(pool_map(evaluate_move, jobs, workers))
+
+    analyses = []
+    for (size, win_length), history in zip(size_settings, histories):
+        moves = []
+        for ply, (player, cell) in enumerate(history):
+            best_cell, best, played = next(evaluations)
+            moves.append(
+                {
+                    "ply": ply,
+                    "player": player,
+                    "cell": cell,
+                    "best_move": best_cell,
+                    "outcome": played,
+                    "best_outcome": best,
+                    "judgement": judge(best, played),
+                }
+            )
+        analyses.append({"moves": moves, "decided_at": decided_at(moves)})
+    return analyses
+
+
+def decided_at(moves: List[dict]) -> Optional[int]:
+    """
+    First ply from which every move keeps the final result, i.e. the winner's
+    moves keep a win and the loser's a loss, or all moves keep a draw.
+    """
+    if not moves:
+        return None
+    last = moves[-1]
+    # the last move either won or filled the board
+    final = {last["player"]: last["outcome"]}
+    final[1 - last["player"]] = {WIN: LOSS, LOSS: WIN}.get(last["outcome"], DRAW)
+    decided = None
+    for move in reversed(moves):
+        if move["outcome"] != final[move["player"]]:
+            break
+        decided = move["ply"]
+    return decided
@@ -0,0 +1,230 @@
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+
+def mask_of(cells: Iterable[int]) -> int:
+    """Return bitmask with a bit set for every given cell."""
+    mask = 0
+    for cell in cells:
+        mask |= 1 << cell
+    return mask
+
+
+Line = Tuple[int, ...]
+
+# (row, column) steps along a column, a row and both diagonals, ordered the same
+# way as cells of lines in the winning lines table
+DIRECTIONS = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+
+def winning_lines(board_size: int, win_length: Optional[int] = None) -> Tuple[Line, ...]:
+    """
+    Return every segment of `win_length` cells (by default the full length of
+    the board) in rows, columns and diagonals. The table is computed once per
+    board size and win length and shared by the whole process.
+    Cells are numbered vertically from the top left corner to the bottom,
+    so column `c` holds cells `c * board_size` .. `c * board_size + board_size - 1`.
+    """
+    return _winning_lines(board_size, win_length or board_size)
+
+
+def line_masks(
+    board_size: int, win_length: Optional[int] = None
+) -> Tuple[Tuple[int, Line], ...]:
+    """Return pairs of (bitmask, cells) for every winning line of the board."""
+    return _line_masks(board_size, win_length or board_size)
+
+
+# board settings whose tables are kept, tables of others are built again
+CACHED_BOARDS = 64
+
+
+@lru_cache(maxsize=CACHED_BOARDS)
+def _winning_lines(board_size: int, win_length: int) -> Tuple[Line, ...]:
+    def cell(row: int, col: int) -> int:
+        return col * board_size + row
+
+    starts = range(board_size - win_length + 1)
+    steps = range(win_length)
+    rows = [
+        tuple(cell(row, col + i) for i in steps)
+        for row in range(board_size)
+        for col in starts
+    ]
+    columns = [
+        tuple(cell(row + i, col) for i in steps)
+        for col in range(board_size)
+        for row in starts
+    ]
+    first_diagonals = [
+        tuple(cell(row + i, col + i) for i in steps) for row in starts for col in starts
+    ]
+    second_diagonals = [
+        tuple(cell(row + i, col - i) for i in steps)
+        for row in starts
+        for col in range(win_length - 1, board_size)
+    ]
+    return tuple(rows + columns + first_diagonals + second_diagonals)
+
+
+@lru_cache(maxsize=CACHED_BOARDS)
+def _line_masks(board_size: int, win_length: int) -> Tuple[Tuple[int, Line], ...]:
+    return tuple(
+        (mask_of(line), line) for line in _winning_lines(board_size, win_length)
+    )
+
+
+def winning_run(
+    size: int, win_length: int, mask: int, cell: int
+) -> Optional[List[int]]:
+    """
+    Return `win_length` cells of mask in a row passing through cell or None.
+    Only neighbours of the cell are visited, so it costs O(win_length).
+    """
+    col, row = divmod(cell, size)
+    for row_step, col_step in DIRECTIONS:
+        step = col_step * size + row_step
+        before = []
+        r, c, n = row - row_step, col - col_step, cell - step
+        while (
+            len(before) < win_length - 1
+            and 0 <= r < size
+            and 0 <= c < size
+            and mask >> n & 1
+        ):
+            before.append(n)
+            r, c, n = r - row_step, c - col_step, n - step
+        after = []
+        r, c, n = row + row_step, col + col_step, cell + step
+        while (
+            len(after) < win_length - 1
+            and 0 <= r < size
+            and 0 <= c < size
+            and mask >> n & 1
+        ):
+            after.append(n)
+            r, c, n = r + row_step, c + col_step, n + step
+        if len(before) + len(after) + 1 >= win_length:
+            return (before[::-1] + [cell] + after)[:win_length]
+    return None
+
+
+class Board:
+    """
+    Bitboard of a square game. Every player's moves are kept as one integer
+    bitmask, bit `n` being set when the player took cell `n`.
+    Players are referenced by their index (slot) in `masks`.
+    A player wins with `win_length` cells in a row, by default a full line.
+    """
+
+    __slots__ = ("size", "masks", "win_length", "occupied")
+
+    def __init__(
+        self,
+        size: int,
+        masks: Sequence[int] = (0, 0),
+        win_length: Optional[int] = None,
+    ):
+        self.size = size
+        self.masks = list(masks)
+        self.win_length = win_length or size
+        # cells taken by any player, kept up to date by `play`
+        self.occupied = 0
+        for mask in self.masks:
+            self.occupied |= mask
+
+    @classmethod
+    def from_moves(
+        cls,
+        size: int,
+        moves: Iterable[Iterable[int]],
+        win_length: Optional[int] = None,
+    ) -> "Board":
+        """Build board from list of played cells per player."""
+        return cls(size, [mask_of(cells) for cells in moves], win_length)
+
+    @classmethod
+    def from_bytes(
+        cls, size: int, data: bytes, win_length: Optional[int] = None
+    ) -> "Board":
+        """
+        Build board from packed masks, see `to_bytes`.
+        Empty data stands for an empty board of two players.
+        """
+        width = cls.mask_width(size)
+        if not data:
+            return cls(size, win_length=win_length)
+        masks = [
+            int.from_bytes(data[offset : offset + width], "little")
+            for offset in range(0, len(data), width)
+        ]
+        return cls(size, masks, win_length)
+
+    @staticmethod
+    def mask_width(size: int) -> int:
+        """Number of bytes taken by one player's mask."""
+        return (size * size + 7) // 8
+
+    def to_bytes(self) -> bytes:
+        """Pack players' masks into fixed-width little endian bytes, one after another."""
+        width = self.mask_width(self.size)
+        return b"".join(mask.to_bytes(width, "little") for mask in self.masks)
+
+    @property
+    def cells_count(self) -> int:
+        return self.size * self.size
+
+    @property
+    def full_mask(self) -> int:
+        return (1 << self.cells_count) - 1
+
+    @property
+    def ply(self) -> int:
+        """Number of moves played so far."""
+        return bin(self.occupied).count("1")
+
+    def is_on_board(self, cell: int) -> bool:
+        return 0 <= cell < self.cells_count
+
+    def is_free(self, cell: int) -> bool:
+        return not self.occupied >> cell & 1
+
+    def is_legal(self, cell: int) -> bool:
+        return self.is_on_board(cell) and self.is_free(cell)
+
+    def is_full(self) -> bool:
+        return self.occupied == self.full_mask
+
+    def play(self, player: int, cell: int) -> None:
+        bit = 1 << cell
+        self.masks[player] |= bit
+        self.occupied |= bit
+
+    def cells_of(self, player: int) -> List[int]:
+        """Return cells taken by player in ascending order."""
+        cells = []
+        mask = self.masks[player]
+        while mask:
+            lowest = mask & -mask
+            cells.append(lowest.bit_length() - 1)
+            mask ^= lowest
+        return cells
+
+    def moves_count(self, player: int) -> int:
+        return bin(self.masks[player]).count("1")
+
+    def winning_line(
+        self, player: int, last_move: Optional[int] = None
+    ) -> Optional[List[int]]:
+        """
+        Return cells of the line completed by player or None.
+        When `last_move` is given only runs passing through it are counted,
+        which costs O(win_length) whatever the size of the board.
+        """
+        mask = self.masks[player]
+        if last_move is not None:
+            return winning_run(self.size, self.win_length, mask, last_move)
+        for line_mask, line in line_masks(self.size, self.win_length):
+            if mask & line_mask == line_mask:
+                return list(line)
+        return None
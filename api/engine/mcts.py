@@ -0,0 +1,207 @@
+"""
+Monte Carlo tree search for boards too big to be searched exhaustively.
+
+Every simulation walks the tree by UCT, adds one node and finishes the game
+with random moves. Searches are parallelised at the root: each worker
+process grows its own tree with a share of the simulation budget and the
+visits of root moves are summed up.
+"""
+import math
+import random
+import time
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from api.engine.board import Board, winning_run
+from api.engine.pool import default_workers, get_executor
+from api.engine.search import candidate_cells
+
+DRAW = -1
+
+# exploration constant of UCT
+EXPLORATION = math.sqrt(2)
+
+# visits and wins of every root move
+Stats = Dict[int, Tuple[int, float]]
+
+
+class Node:
+    __slots__ = (
+        "move",
+        "parent",
+        "player",
+        "children",
+        "untried",
+        "visits",
+        "wins",
+        "result",
+    )
+
+    def __init__(self, move: Optional[int], parent: Optional["Node"], player: int):
+        self.move = move
+        self.parent = parent
+        # slot of the player who made the move leading here
+        self.player = player
+        self.children: List[Node] = []
+        self.untried: List[int] = []
+        self.visits = 0
+        self.wins = 0.0
+        # winner slot or DRAW once the game is over, None while it goes on
+        self.result: Optional[int] = None
+
+    def select_child(self) -> "Node":
+        log_visits = math.log(self.visits)
+        return max(
+            self.children,
+            key=lambda child: child.wins / child.visits
+            + EXPLORATION * math.sqrt(log_visits / child.visits),
+        )
+
+
+def search(
+    size: int,
+    win_length: int,
+    masks: Sequence[int],
+    player: int,
+    simulations: int,
+    seed: Optional[int] = None,
+    time_budget: Optional[float] = None,
+) -> Stats:
+    """
+    Run `simulations` playouts from the position with the player in given
+    slot to move, fewer if `time_budget` seconds pass before, at least one.
+    Return visits and wins of every root move.
+    """
+    rng = random.Random(seed)
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    full_mask = (1 << size * size) - 1
+    root_occupied = masks[0] | masks[1]
+    # playouts draw from a copy of free cells, skipping the ones of the path
+    root_free = [
+        cell for cell in range(size * size) if not root_occupied >> cell & 1
+    ]
+    root = Node(None, None, 1 - player)
+    root.untried = candidate_cells(size, root_occupied)
+
+    for simulation in range(simulations):
+        if simulation and deadline is not None and time.monotonic() >= deadline:
+            break
+        node = root
+        state = list(masks)
+        occupied = root_occupied
+        path = set()
+
+        # selection
+        while not node.untried and node.children and node.result is None:
+            node = node.select_child()
+            state[node.player] |= 1 << node.move
+            occupied |= 1 << node.move
+            path.add(node.move)
+
+        # expansion
+        if node.untried and node.result is None:
+            cell = node.untried.pop(rng.randrange(len(node.untried)))
+            mover = 1 - node.player
+            state[mover] |= 1 << cell
+            occupied |= 1 << cell
+            path.add(cell)
+            child = Node(cell, node, mover)
+            if winning_run(size, win_length, state[mover], cell) is not None:
+                child.result = mover
+            elif occupied == full_mask:
+                child.result = DRAW
+            else:
+                child.untried = candidate_cells(size, occupied)
+            node.children.append(child)
+            node = child
+
+        # playout
+        result = node.result
+        if result is None:
+            result = playout(
+                size, win_length, state, root_free, path, 1 - node.player, rng
+            )
+
+        # backpropagation
+        while node is not None:
+            node.visits += 1
+            if result == node.player:
+                node.wins += 1
+            elif result == DRAW:
+                node.wins += 0.5
+            node = node.parent
+
+    return {child.move: (child.visits, child.wins) for child in root.children}
+
+
+def playout(
+    size: int,
+    win_length: int,
+    state: List[int],
+    free: List[int],
+    taken: Set[int],
+    player: int,
+    rng: random.Random,
+) -> int:
+    """
+    Finish the game with random moves among free cells but the taken ones,
+    return the winner slot or DRAW. Cells are drawn one by one, so a game
+    decided early costs only its moves, not a shuffle of the whole board.
+    """
+    free = free[:]
+    remaining = len(free)
+    while remaining:
+        index = rng.randrange(remaining)
+        cell = free[index]
+        remaining -= 1
+        free[index] = free[remaining]
+        if cell in taken:
+            continue
+        state[player] |= 1 << cell
+        if winning_run(size, win_length, state[player], cell) is not None:
+            return player
+        player = 1 - player
+    return DRAW
+
+
+def parallel_search(
+    board: Board,
+    player: int,
+    simulations: int,
+    workers: Optional[int] = None,
+    time_budget: Optional[float] = None,
+) -> Stats:
+    """
+    Split the simulation budget among worker processes, each growing its own
+    tree for at most `time_budget` seconds, and merge statistics of root
+    moves. One worker runs in process.
+    """
+    workers = max(1, min(workers or default_workers(), simulations))
+    args = (board.size, board.win_length, tuple(board.masks[:2]), player)
+    if workers == 1:
+        return search(*args, simulations, None, time_budget)
+
+    shares = [
+        simulations // workers + (n < simulations % workers) for n in range(workers)
+    ]
+    executor = get_executor()
+    futures = [
+        executor.submit(search, *args, share, None, time_budget) for share in shares
+    ]
+    merged: Stats = {}
+    for future in futures:
+        for move, (visits, wins) in future.result().items():
+            total_visits, total_wins = merged.get(move, (0, 0.0))
+            merged[move] = (total_visits + visits, total_wins + wins)
+    return merged
+
+
+def best_move(
+    board: Board,
+    player: int,
+    simulations: int = 1000,
+    workers: Optional[int] = None,
+    time_budget: Optional[float] = None,
+) -> int:
+    """Return the most visited root move."""
+    stats = parallel_search(board, player, simulations, workers, time_budget)
+    return max(stats, key=lambda move: stats[move][0])
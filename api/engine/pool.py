@@ -0,0 +1,59 @@
+"""
+Pool of worker processes shared by CPU bound engine jobs of this process,
+created on first use so forked servers start one per worker. Its size is
+`ENGINE_POOL_SIZE` (one process per CPU by default) and it lives as long as
+the process, callers limit how many of its processes they occupy.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, List, Optional, Sequence
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def default_workers() -> int:
+    """Size of the pool, from Django settings when they're configured."""
+    from django.conf import settings
+
+    size = None
+    if settings.configured:
+        size = getattr(settings, "ENGINE_POOL_SIZE", None)
+    return size or os.cpu_count() or 1
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=default_workers())
+    return _executor
+
+
+def _run_chunk(function: Callable, chunk: Sequence[tuple]) -> List:
+    return [function(*args) for args in chunk]
+
+
+def pool_map(
+    function: Callable, items: Iterable, workers: Optional[int] = None
+) -> List:
+    """
+    Map function over items in at most `workers` processes of the pool, in
+    process for one worker.
+    """
+    items = list(items)
+    workers = max(1, min(workers or default_workers(), len(items)))
+    if workers == 1:
+        return _run_chunk(function, items)
+    # one job per worker, items dealt out in turn even out uneven jobs
+    executor = get_executor()
+    futures = [
+        executor.submit(_run_chunk, function, items[n::workers])
+        for n in range(workers)
+    ]
+    results: List = [None] * len(items)
+    for n, future in enumerate(futures):
+        results[n::workers] = future.result()
+    return results
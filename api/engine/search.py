@@ -0,0 +1,273 @@
+"""
+Computer player: negamax search with alpha-beta pruning over bitboards.
+
+Positions are seen from the side to move as a pair of masks `(me, opponent)`.
+Boards small enough are solved exactly (perfect play), bigger ones are
+searched with iterative deepening until a time budget runs out, scoring
+the leaves with a heuristic of open runs.
+"""
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from api.engine.board import CACHED_BOARDS, DIRECTIONS, Board, winning_run
+
+# boards with at most that many cells are solved to the end
+EXACT_SEARCH_CELLS = 9
+
+# a win scores above any heuristic value, sooner wins score higher
+WIN_SCORE = 1 << 20
+INFINITY = WIN_SCORE << 1
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# transposition tables of exactly solved boards, shared by the whole process
+_exact_tables: Dict[Tuple[int, int], dict] = {}
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+@lru_cache(maxsize=CACHED_BOARDS)
+def symmetries(size: int) -> Tuple[Tuple[int, ...], ...]:
+    """
+    Return the 8 symmetries of a square board (rotations and reflections)
+    as permutations: `permutation[cell]` is where cell is moved to.
+    """
+    transforms = (
+        lambda r, c: (r, c),
+        lambda r, c: (c, size - 1 - r),
+        lambda r, c: (size - 1 - r, size - 1 - c),
+        lambda r, c: (size - 1 - c, r),
+        lambda r, c: (r, size - 1 - c),
+        lambda r, c: (size - 1 - r, c),
+        lambda r, c: (c, r),
+        lambda r, c: (size - 1 - c, size - 1 - r),
+    )
+    permutations = []
+    for transform in transforms:
+        permutation = []
+        for cell in range(size * size):
+            col, row = divmod(cell, size)
+            new_row, new_col = transform(row, col)
+            permutation.append(new_col * size + new_row)
+        permutations.append(tuple(permutation))
+    return tuple(permutations)
+
+
+def _cells(mask: int) -> List[int]:
+    cells = []
+    while mask:
+        lowest = mask & -mask
+        cells.append(lowest.bit_length() - 1)
+        mask ^= lowest
+    return cells
+
+
+def _permute(mask: int, permutation: Tuple[int, ...]) -> int:
+    permuted = 0
+    for cell in _cells(mask):
+        permuted |= 1 << permutation[cell]
+    return permuted
+
+
+@lru_cache(maxsize=CACHED_BOARDS)
+def _edge_masks(size: int) -> Tuple[int, int]:
+    """Masks of cells not in the top row and not in the bottom row."""
+    full = (1 << size * size) - 1
+    top = sum(1 << col * size for col in range(size))
+    bottom = top << size - 1
+    return full & ~top, full & ~bottom
+
+
+def candidate_cells(size: int, occupied: int) -> List[int]:
+    """
+    Free cells worth playing: all of them on small boards, on bigger ones
+    only the cells next to a taken one. The center opens an empty board.
+    """
+    if not occupied:
+        center = size // 2
+        return [center * size + center]
+    free = (1 << size * size) - 1 & ~occupied
+    if size * size <= EXACT_SEARCH_CELLS:
+        return _cells(free)
+    not_top, not_bottom = _edge_masks(size)
+    column = occupied | (occupied & not_top) >> 1 | (occupied & not_bottom) << 1
+    around = column | column << size | column >> size
+    return _cells(around & free)
+
+
+class Negamax:
+    """
+    Negamax search of one board geometry with a transposition table keyed
+    by the pair of masks. With `symmetric` the key is the smallest pair
+    among the 8 symmetries, so equivalent positions share one entry.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        win_length: int,
+        table: Optional[dict] = None,
+        symmetric: bool = False,
+        deadline: Optional[float] = None,
+    ):
+        self.size = size
+        self.win_length = win_length
+        self.full_mask = (1 << size * size) - 1
+        self.table = {} if table is None else table
+        self.permutations = symmetries(size)[1:] if symmetric else ()
+        self.deadline = deadline
+        self.nodes = 0
+
+    def key(self, me: int, opponent: int) -> Tuple[int, int]:
+        key = (me, opponent)
+        for permutation in self.permutations:
+            key = min(key, (_permute(me, permutation), _permute(opponent, permutation)))
+        return key
+
+    def wins(self, mask: int, cell: int) -> bool:
+        return winning_run(self.size, self.win_length, mask, cell) is not None
+
+    def candidates(self, me: int, opponent: int) -> List[int]:
+        return candidate_cells(self.size, me | opponent)
+
+    def evaluate(self, me: int, opponent: int) -> int:
+        return self.runs_score(me, opponent) - self.runs_score(opponent, me)
+
+    def runs_score(self, mask: int, other: int) -> int:
+        """
+        Sum of runs of mask which can still be extended, weighted by length
+        and by the number of open ends.
+        """
+        size, win_length = self.size, self.win_length
+        score = 0
+        for cell in _cells(mask):
+            col, row = divmod(cell, size)
+            for row_step, col_step in DIRECTIONS:
+                step = col_step * size + row_step
+                r, c = row - row_step, col - col_step
+                before = 0 <= r < size and 0 <= c < size
+                if before and mask >> cell - step & 1:
+                    # counted from the first cell of the run
+                    continue
+                open_ends = int(before and not other >> cell - step & 1)
+                length, r, c, n = 1, row + row_step, col + col_step, cell + step
+                while 0 <= r < size and 0 <= c < size and mask >> n & 1:
+                    length, r, c, n = length + 1, r + row_step, c + col_step, n + step
+                if 0 <= r < size and 0 <= c < size and not other >> n & 1:
+                    open_ends += 1
+                if open_ends:
+                    score += open_ends * 8 ** min(length, win_length - 1)
+        return score
+
+    def search(self, me: int, opponent: int, depth: int, alpha: int, beta: int) -> int:
+        """Score of the position for the side to move, `me`."""
+        occupied = me | opponent
+        if occupied == self.full_mask:
+            return 0
+        if depth == 0:
+            return self.evaluate(me, opponent)
+        self.nodes += 1
+        if self.deadline is not None and not self.nodes & 63:
+            if time.monotonic() > self.deadline:
+                raise SearchTimeout
+
+        key = self.key(me, opponent)
+        entry = self.table.get(key)
+        best_move = None
+        if entry is not None:
+            entry_depth, value, bound, best_move = entry
+            if entry_depth >= depth:
+                if bound == EXACT:
+                    return value
+                if bound == LOWER:
+                    alpha = max(alpha, value)
+                elif bound == UPPER:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+
+        moves = self.candidates(me, opponent)
+        if best_move in moves:
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+        original_alpha = alpha
+        best_value = -INFINITY
+        for cell in moves:
+            played = me | 1 << cell
+            if self.wins(played, cell):
+                # sooner wins are better: count cells left free
+                value = WIN_SCORE + self.full_mask.bit_length() - bin(occupied).count("1")
+            else:
+                value = -self.search(opponent, played, depth - 1, -beta, -alpha)
+            if value > best_value:
+                best_value, best_move = value, cell
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if best_value <= original_alpha:
+            bound = UPPER
+        elif best_value >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        # best moves are kept only for ordering and don't survive symmetries
+        self.table[key] = (depth, best_value, bound, None if self.permutations else best_move)
+        return best_value
+
+    def best_move(self, me: int, opponent: int, depth: int) -> Tuple[int, int]:
+        """Return `(cell, score)` of the best move searched `depth` plies deep."""
+        moves = self.candidates(me, opponent)
+        entry = self.table.get((me, opponent))
+        if entry is not None and entry[3] in moves:
+            moves.remove(entry[3])
+            moves.insert(0, entry[3])
+        best_cell, alpha = moves[0], -INFINITY
+        for cell in moves:
+            played = me | 1 << cell
+            if self.wins(played, cell):
+                return cell, WIN_SCORE
+            value = -self.search(opponent, played, depth - 1, -INFINITY, -alpha)
+            if value > alpha:
+                best_cell, alpha = cell, value
+        if not self.permutations:
+            self.table[(me, opponent)] = (depth, alpha, EXACT, best_cell)
+        return best_cell, alpha
+
+
+def exact_search(size: int, win_length: int) -> Negamax:
+    """Search solving small boards to the end, sharing the process-wide table."""
+    table = _exact_tables.setdefault((size, win_length), {})
+    return Negamax(size, win_length, table, symmetric=True)
+
+
+def best_move(board: Board, player: int, time_budget: float = 0.1) -> int:
+    """
+    Return the cell the player in given slot should take. Small boards are
+    solved exactly, bigger ones searched deeper and deeper until
+    `time_budget` seconds are spent, keeping the last fully searched move.
+    """
+    me = board.masks[player]
+    opponent = board.occupied & ~me
+    empty_cells = board.cells_count - board.ply
+
+    if board.cells_count <= EXACT_SEARCH_CELLS:
+        search = exact_search(board.size, board.win_length)
+        return search.best_move(me, opponent, empty_cells)[0]
+
+    search = Negamax(
+        board.size, board.win_length, deadline=time.monotonic() + time_budget
+    )
+    cell = search.candidates(me, opponent)[0]
+    for depth in range(1, empty_cells + 1):
+        try:
+            cell, score = search.best_move(me, opponent, depth)
+        except SearchTimeout:
+            break
+        if abs(score) >= WIN_SCORE:
+            # the result is forced, a deeper search can't change it
+            break
+    return cell
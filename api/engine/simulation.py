@@ -0,0 +1,70 @@
+"""
+Headless self-play: games played with the same board calls as a move
+request (legality check, play, win and tie checks), without Django, to
+measure throughput of the engine apart from HTTP and database.
+"""
+import random
+from typing import Dict, Optional
+
+from api.engine import search
+from api.engine.board import Board
+
+RANDOM, ENGINE, MIXED = "random", "engine", "mixed"
+STRATEGIES = (RANDOM, ENGINE, MIXED)
+
+
+def play_game(
+    size: int,
+    win_length: int,
+    strategy: str,
+    rng: random.Random,
+    time_budget: float = 0.01,
+) -> Dict[str, Optional[int]]:
+    """
+    Play one game, return the winner slot (None for a draw) and moves count.
+    With `mixed` strategy the engine plays the second slot against random moves.
+    """
+    board = Board(size, win_length=win_length)
+    # random players take free cells in a shuffled order
+    cells = list(range(board.cells_count))
+    rng.shuffle(cells)
+    player = 0
+    while True:
+        if strategy == ENGINE or (strategy == MIXED and player == 1):
+            cell = search.best_move(board, player, time_budget)
+        else:
+            cell = cells.pop()
+            while not board.is_free(cell):
+                cell = cells.pop()
+        if not board.is_legal(cell):
+            raise ValueError("Illegal move {} by {} player.".format(cell, strategy))
+        board.play(player, cell)
+        if board.winning_line(player, cell):
+            return {"winner": player, "moves": board.ply}
+        if board.is_full():
+            return {"winner": None, "moves": board.ply}
+        player = 1 - player
+
+
+def simulate(
+    size: int,
+    win_length: int,
+    games: int,
+    strategy: str = RANDOM,
+    seed: Optional[int] = None,
+    time_budget: float = 0.01,
+) -> Dict[str, int]:
+    """Play games in a row, return totals of moves, wins per slot and draws."""
+    rng = random.Random(seed)
+    totals = {"games": 0, "moves": 0, "first_wins": 0, "second_wins": 0, "draws": 0}
+    for _game in range(games):
+        result = play_game(size, win_length, strategy, rng, time_budget)
+        totals["games"] += 1
+        totals["moves"] += result["moves"]
+        if result["winner"] is None:
+            totals["draws"] += 1
+        elif result["winner"] == 0:
+            totals["first_wins"] += 1
+        else:
+            totals["second_wins"] += 1
+    return totals
@@ -0,0 +1,128 @@
+"""
+Tablebase of the classic 3x3 game: the best move and the outcome of every
+position, solved once by `manage.py build_tablebase` and read from a memory
+mapped file, so worker processes share the same pages.
+
+A position is seen from the side to move and indexed by its base-3 encoding:
+cell `n` contributes `3 ** n` times 0 when free, 1 when taken by the side to
+move, 2 when taken by the opponent. Each entry is one byte, the best cell in
+the low nibble (`NO_MOVE` when the game is over) and the outcome for the side
+to move in the high one.
+"""
+import mmap
+import os
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from api.engine.board import Board, winning_run
+
+MAGIC = b"TTTB"
+SIZE = 3
+WIN_LENGTH = 3
+CELLS = SIZE * SIZE
+POSITIONS = 3**CELLS
+
+NO_MOVE = 0x0F
+UNKNOWN, WIN, DRAW, LOSS = 0, 1, 2, 3
+OUTCOMES = {WIN: "win", DRAW: "draw", LOSS: "loss"}
+
+_POWERS = tuple(3**cell for cell in range(CELLS))
+
+
+def encode(me: int, opponent: int) -> int:
+    """Base-3 index of the position, `me` being the side to move."""
+    index = 0
+    for cell in range(CELLS):
+        if me >> cell & 1:
+            index += _POWERS[cell]
+        elif opponent >> cell & 1:
+            index += 2 * _POWERS[cell]
+    return index
+
+
+def solve() -> bytes:
+    """Solve every position reachable from the empty board, return the table."""
+    # positions never reached have no move nor outcome
+    table = bytearray([UNKNOWN << 4 | NO_MOVE]) * POSITIONS
+    full_mask = (1 << CELLS) - 1
+    scores: Dict[Tuple[int, int], int] = {}
+
+    def score(me: int, opponent: int) -> int:
+        # positive when the side to move wins, the sooner the higher
+        key = (me, opponent)
+        if key in scores:
+            return scores[key]
+        best_cell, best_score = NO_MOVE, None
+        free = full_mask & ~(me | opponent)
+        for cell in range(CELLS):
+            if not free >> cell & 1:
+                continue
+            played = me | 1 << cell
+            if winning_run(SIZE, WIN_LENGTH, played, cell) is not None:
+                value = 1 + bin(free).count("1")
+                # the game is over, lost for the opponent
+                table[encode(opponent, played)] = LOSS << 4 | NO_MOVE
+            elif free == 1 << cell:
+                value = 0
+                table[encode(opponent, played)] = DRAW << 4 | NO_MOVE
+            else:
+                value = -score(opponent, played)
+            if best_score is None or value > best_score:
+                best_cell, best_score = cell, value
+        scores[key] = best_score
+        outcome = WIN if best_score > 0 else LOSS if best_score < 0 else DRAW
+        table[encode(me, opponent)] = outcome << 4 | best_cell
+        return best_score
+
+    score(0, 0)
+    return bytes(table)
+
+
+def write(path: str) -> None:
+    with open(path, "wb") as file:
+        file.write(MAGIC + bytes([SIZE, WIN_LENGTH]) + solve())
+
+
+class Tablebase:
+    """Read-only view of a tablebase file, see `write`."""
+
+    header_length = len(MAGIC) + 2
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        header = self._data[: self.header_length]
+        if header != MAGIC + bytes([SIZE, WIN_LENGTH]) or (
+            len(self._data) != self.header_length + POSITIONS
+        ):
+            self._data.close()
+            raise ValueError("{} is not a 3x3 tablebase.".format(path))
+
+    def covers(self, board: Board) -> bool:
+        return board.size == SIZE and board.win_length == WIN_LENGTH
+
+    def lookup(self, board: Board, player: int) -> Tuple[Optional[int], Optional[str]]:
+        """
+        Return the best cell for the player in given slot and the outcome
+        with perfect play, `(None, None)` for positions never reached.
+        """
+        me = board.masks[player]
+        entry = self._data[self.header_length + encode(me, board.occupied & ~me)]
+        cell = entry & 0x0F
+        return (None if cell == NO_MOVE else cell), OUTCOMES.get(entry >> 4)
+
+
+def load_tablebase(path: str) -> Optional[Tablebase]:
+    """
+    Open the tablebase once per process and version of the file, so one
+    built or rebuilt meanwhile is picked up. None if it wasn't built.
+    """
+    try:
+        return _open_tablebase(path, os.stat(path).st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+
+@lru_cache(maxsize=4)
+def _open_tablebase(path: str, mtime: int) -> Tablebase:
+    return Tablebase(path)
@@ -0,0 +1,156 @@
+"""
+Game updates published after a move is committed, delivered to websocket
+clients of the game. The backend is set by `GAME_EVENTS_BACKEND` setting.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Set
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from api.models import Game
+
+log = logging.getLogger()
+
+DEFAULT_BACKEND = "api.events.LocalGameEventsBackend"
+
+
+def game_state(game, player_ids: List[int]) -> dict:
+    """Public state of the game sent to clients."""
+    return {
+        "game": game.id,
+        "version": game.version,
+        "game_status": game.get_game_status(player_ids),
+        "current_player": game.current_player_id,
+        "is_done": game.is_done,
+        "has_winner": game.has_winner,
+        "winner_combination": game.winner_combination,
+    }
+
+
+def load_game_state(pk: int) -> Optional[dict]:
+    """Read state of the game from database, None if it doesn't exist."""
+    game = Game.objects.filter(pk=pk).prefetch_related("players").first()
+    if game is None:
+        return None
+    return dict(game_state(game, game.player_ids), type="state")
+
+
+def game_events(game, player_ids: List[int]) -> List[dict]:
+    """Events of the last move: new state, then winner or draw if game ended."""
+    events = [dict(game_state(game, player_ids), type="move")]
+    if game.has_winner:
+        events.append(
+            {
+                "type": "winner",
+                "game": game.id,
+                "winner": game.current_player_id,
+                "winner_combination": game.winner_combination,
+            }
+        )
+    elif game.is_done:
+        events.append({"type": "draw", "game": game.id})
+    return events
+
+
+class Subscription:
+    """Queue of events of one game for one listener."""
+
+    def __init__(self, backend: "LocalGameEventsBackend", game_id: int):
+        self.backend = backend
+        self.game_id = game_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+    def close(self) -> None:
+        self.backend.unsubscribe(self)
+
+
+class LocalGameEventsBackend:
+    """
+    Fan-out to listeners of the current process, no broker needed.
+    Events can be published from any thread, listeners live in event loops.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: Dict[int, Set[Subscription]] = defaultdict(set)
+
+    def subscribe(self, game_id: int) -> Subscription:
+        subscription = Subscription(self, game_id)
+        with self._lock:
+            self._subscriptions[game_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.game_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.game_id, None)
+
+    def publish(self, game_id: int, events: List[dict]) -> None:
+        self.deliver(game_id, events)
+
+    def deliver(self, game_id: int, events: List[dict]) -> None:
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(game_id, ()))
+        for subscription in subscriptions:
+            for event in events:
+                try:
+                    subscription.loop.call_soon_threadsafe(
+                        subscription.queue.put_nowait, event
+                    )
+                except RuntimeError:
+                    # loop of a listener already closed
+                    self.unsubscribe(subscription)
+
+
+class RedisGameEventsBackend(LocalGameEventsBackend):
+    """
+    Fan-out across processes through Redis pub/sub. Every process relays
+    messages from Redis to its local listeners. Requires `redis` package
+    and `GAME_EVENTS_REDIS_URL` setting.
+    """
+
+    channel_prefix = "tictactoe:game:"
+
+    def __init__(self):
+        import redis
+
+        super().__init__()
+        self._redis = redis.Redis.from_url(settings.GAME_EVENTS_REDIS_URL)
+        self._listener = threading.Thread(target=self._listen, daemon=True)
+        self._listener.start()
+
+    def publish(self, game_id: int, events: List[dict]) -> None:
+        self._redis.publish(self.channel_prefix + str(game_id), json.dumps(events))
+
+    def _listen(self) -> None:
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(self.channel_prefix + "*")
+        for message in pubsub.listen():
+            game_id = int(message["channel"].decode()[len(self.channel_prefix) :])
+            self.deliver(game_id, json.loads(message["data"]))
+
+
+@lru_cache(maxsize=None)
+def get_backend() -> LocalGameEventsBackend:
+    return import_string(getattr(settings, "GAME_EVENTS_BACKEND", DEFAULT_BACKEND))()
+
+
+def publish_events(game_id: int, events: List[dict]) -> None:
+    """Publish events of a game, to be called once the move is committed."""
+    try:
+        get_backend().publish(game_id, events)
+    except Exception:
+        # clients fall back to reading the game, never fail the move
+        log.exception("Publishing events of game %s failed.", game_id)
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Game, GameAnalysis
+from api.serializers import GameAnalysisSerializer
+
+
+class Command(BaseCommand):
+    help = "Analyse finished games in batches, see `/api/play/<id>/analysis`."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Analyse again games which were already analysed.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Worker processes, ANALYSIS_WORKERS setting by default.",
+        )
+
+    def handle(self, *args, **options):
+        games = Game.objects.filter(is_done=True).order_by("id")
+        if not options["all"]:
+            games = games.filter(analysis__isnull=True)
+        batch_size = options["batch_size"]
+        analysed = skipped = 0
+        last_id = 0
+        while True:
+            # keyset pagination, analysed games drop out of the filter
+            batch = list(games.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            if options["all"]:
+                GameAnalysis.objects.filter(game__in=batch).delete()
+            analyses = GameAnalysisSerializer.analyse(batch, workers=options["workers"])
+            analysed += len(analyses)
+            skipped += len(batch) - len(analyses)
+            last_id = batch[-1].id
+            self.stdout.write("{} games analysed.".format(analysed))
+        if skipped:
+            self.stdout.write(
+                "{} games skipped, their moves weren't recorded.".format(skipped)
+            )
+        self.stdout.write(self.style.SUCCESS("Done, {} games analysed.".format(analysed)))
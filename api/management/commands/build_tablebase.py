@@ -0,0 +1,28 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.engine import tablebase
+
+
+class Command(BaseCommand):
+    help = "Solve every 3x3 position and write the tablebase read by hints and the computer player."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default=str(settings.TABLEBASE_PATH),
+            help="Path of the tablebase file, TABLEBASE_PATH setting by default.",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["output"])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # write aside and swap, processes mapping the old file keep reading it
+        temporary_path = path.with_suffix(".tmp")
+        tablebase.write(str(temporary_path))
+        temporary_path.replace(path)
+        self.stdout.write(
+            self.style.SUCCESS("Tablebase written to {}.".format(path))
+        )
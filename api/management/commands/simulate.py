@@ -0,0 +1,96 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.engine.pool import default_workers, pool_map
+from api.engine.simulation import RANDOM, STRATEGIES, simulate
+
+
+HEADER = "{:>4} {:>4} {:>10} {:>10} {:>12} {:>12} {:>7} {:>7} {:>7}"
+ROW = "{:>4} {:>4} {:>10} {:>10.2f} {:>12.0f} {:>12.0f} {:>7.1f} {:>7.1f} {:>7.1f}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Play games with the pure engine in a pool of processes, no database, "
+        "and report throughput and results per board size."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[3, 4, 5])
+        parser.add_argument(
+            "--win-length",
+            type=int,
+            default=0,
+            help="default: full length of the board",
+        )
+        parser.add_argument(
+            "--games", type=int, default=10000, help="games per board size"
+        )
+        parser.add_argument("--strategy", choices=STRATEGIES, default=RANDOM)
+        parser.add_argument(
+            "--time-budget",
+            type=float,
+            default=0.01,
+            help="seconds the engine may think over a move on big boards",
+        )
+        parser.add_argument("--workers", type=int, default=default_workers())
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        games = options["games"]
+        if games < 1:
+            raise CommandError("--games must be at least 1.")
+        if workers < 1:
+            raise CommandError("--workers must be at least 1.")
+        if min(options["sizes"]) < 1:
+            raise CommandError("--sizes must be at least 1.")
+        self.stdout.write(
+            HEADER.format(
+                "size",
+                "k",
+                "games",
+                "time [s]",
+                "games/s",
+                "moves/s",
+                "1st %",
+                "2nd %",
+                "draw %",
+            )
+        )
+        for size in options["sizes"]:
+            win_length = size
+            if options["win_length"]:
+                win_length = min(options["win_length"], size)
+            # a few chunks per worker even out games of uneven length
+            chunks = min(games, workers * 4)
+            jobs = [
+                (
+                    size,
+                    win_length,
+                    games // chunks + (n < games % chunks),
+                    options["strategy"],
+                    None if options["seed"] is None else options["seed"] + n,
+                    options["time_budget"],
+                )
+                for n in range(chunks)
+            ]
+            start = time.perf_counter()
+            results = pool_map(simulate, jobs, workers)
+            elapsed = time.perf_counter() - start
+
+            totals = {key: sum(result[key] for result in results) for key in results[0]}
+            self.stdout.write(
+                ROW.format(
+                    size,
+                    win_length,
+                    totals["games"],
+                    elapsed,
+                    totals["games"] / elapsed,
+                    totals["moves"] / elapsed,
+                    100 * totals["first_wins"] / totals["games"],
+                    100 * totals["second_wins"] / totals["games"],
+                    100 * totals["draws"] / totals["games"],
+                )
+            )
@@ -0,0 +1,138 @@
+"""
+In-memory index of players waiting for an opponent.
+
+Queues are keyed by board settings, then by how far from their own rating
+players accept an opponent (their band, in rating buckets of
+`MATCHMAKING_BUCKET_WIDTH` points), then by rating bucket. Two players match
+when their buckets are no further apart than the narrower band of both, so
+looking for an opponent checks only the heads of the few queues within
+reach, whatever the number of waiting players. The longest waiting of them
+is taken.
+
+`MatchRequest` rows are the durable state: the index is rebuilt from the
+waiting ones when first used, and an opponent is only taken once its row is
+claimed, so players indexed by several processes are matched once.
+"""
+import itertools
+import threading
+from collections import defaultdict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+
+from api.models import MatchRequest
+
+# board size and win length
+BoardSettings = Tuple[int, int]
+
+
+class Ticket(NamedTuple):
+    player_id: int
+    rating: int
+    # band in buckets
+    reach: int
+    # order of arrival
+    number: int
+
+
+def bucket_of(rating: int) -> int:
+    return rating // settings.MATCHMAKING_BUCKET_WIDTH
+
+
+def reach_of(rating_band: int) -> int:
+    return rating_band // settings.MATCHMAKING_BUCKET_WIDTH
+
+
+class Matchmaker:
+    """Queues of one process, shared by its threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # board settings -> reach -> bucket -> tickets by player id, oldest first
+        self.queues: Dict[BoardSettings, Dict[int, Dict[int, Dict[int, Ticket]]]]
+        self.queues = defaultdict(dict)
+        # where every ticket is queued
+        self.places: Dict[int, Tuple[BoardSettings, int, int]] = {}
+        self.numbers = itertools.count()
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self.places)
+
+    def ticket(self, player_id: int, rating: int, rating_band: int) -> Ticket:
+        return Ticket(player_id, rating, reach_of(rating_band), next(self.numbers))
+
+    def load(self) -> None:
+        """Index players left waiting by previous processes, once."""
+        if self.loaded:
+            return
+        waiting = MatchRequest.objects.filter(game__isnull=True).order_by("date")
+        with self.lock:
+            if self.loaded:
+                return
+            for request in waiting.iterator():
+                board_settings = (request.board_size, request.win_length)
+                if request.player_id not in self.places:
+                    self._add(
+                        board_settings,
+                        self.ticket(
+                            request.player_id, request.rating, request.rating_band
+                        ),
+                    )
+            self.loaded = True
+
+    def match(self, board_settings: BoardSettings, ticket: Ticket) -> Optional[Ticket]:
+        """
+        Take the longest waiting opponent within reach of the player, or
+        queue the player when there's none. A player queued before is
+        queued again with the new settings.
+        """
+        with self.lock:
+            self._remove(ticket.player_id)
+            opponent = self._find(board_settings, ticket)
+            if opponent is None:
+                self._add(board_settings, ticket)
+            else:
+                self._remove(opponent.player_id)
+            return opponent
+
+    def remove(self, player_id: int) -> Optional[Ticket]:
+        with self.lock:
+            return self._remove(player_id)
+
+    def _find(self, board_settings: BoardSettings, ticket: Ticket) -> Optional[Ticket]:
+        bucket = bucket_of(ticket.rating)
+        found = None
+        for reach, buckets in self.queues.get(board_settings, {}).items():
+            distance = min(reach, ticket.reach)
+            for other_bucket in range(bucket - distance, bucket + distance + 1):
+                queue = buckets.get(other_bucket)
+                if not queue:
+                    continue
+                head = next(iter(queue.values()))
+                if found is None or head.number < found.number:
+                    found = head
+        return found
+
+    def _add(self, board_settings: BoardSettings, ticket: Ticket) -> None:
+        bucket = bucket_of(ticket.rating)
+        buckets = self.queues[board_settings].setdefault(ticket.reach, {})
+        buckets.setdefault(bucket, {})[ticket.player_id] = ticket
+        self.places[ticket.player_id] = (board_settings, ticket.reach, bucket)
+
+    def _remove(self, player_id: int) -> Optional[Ticket]:
+        place = self.places.pop(player_id, None)
+        if place is None:
+            return None
+        board_settings, reach, bucket = place
+        buckets = self.queues[board_settings][reach]
+        ticket = buckets[bucket].pop(player_id)
+        # empty queues would be checked by every search
+        if not buckets[bucket]:
+            del buckets[bucket]
+            if not buckets:
+                del self.queues[board_settings][reach]
+        return ticket
+
+
+MATCHMAKER = Matchmaker()
@@ -0,0 +1,297 @@
+"""
+Metrics exposed in Prometheus text format at `/metrics`.
+
+Every process keeps its samples in memory, updating them costs a dict
+lookup under a lock. With `METRICS_DIR` set, processes also dump their
+samples to their own file in that directory, at most every
+`METRICS_FLUSH_INTERVAL` seconds, and `/metrics` sums up the files of all
+processes, so any worker can be scraped. Files of exited processes are kept
+for `METRICS_FILE_RETENTION` seconds, their counts stay part of the totals
+until then. A process idle for longer drops out of the totals until its next
+request.
+
+Only clients from `METRICS_ALLOWED_IPS`, or sending `METRICS_TOKEN`, are
+served.
+"""
+import atexit
+import hmac
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.samples: Dict[LabelValues, object] = {}
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, object]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, values: LabelValues, extra: str = "") -> str:
+        pairs = [
+            '{}="{}"'.format(name, escape(value))
+            for name, value in zip(self.labelnames, values)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with REGISTRY.lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+
+    def merge(self, samples: dict, other: dict) -> None:
+        for key, value in other.items():
+            samples[key] = samples.get(key, 0) + value
+
+    def render(self, samples: Dict[LabelValues, float]) -> List[str]:
+        return [
+            "{}{} {}".format(self.name, self._labels(key), number(value))
+            for key, value in sorted(samples.items())
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=()):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with REGISTRY.lock:
+            # per bucket counts (not cumulative), then sum and count
+            sample = self.samples.get(key)
+            if sample is None:
+                sample = self.samples[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    sample[index] += 1
+                    break
+            sample[-2] += value
+            sample[-1] += 1
+
+    def merge(self, samples: dict, other: dict) -> None:
+        for key, values in other.items():
+            sample = samples.setdefault(key, [0] * len(values))
+            for index, value in enumerate(values):
+                sample[index] += value
+
+    def render(self, samples: Dict[LabelValues, list]) -> List[str]:
+        lines = []
+        for key, sample in sorted(samples.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, sample):
+                cumulative += count
+                labels = self._labels(key, 'le="{}"'.format(number(bound)))
+                lines.append("{}_bucket{} {}".format(self.name, labels, cumulative))
+            labels = self._labels(key, 'le="+Inf"')
+            lines.append("{}_bucket{} {}".format(self.name, labels, sample[-1]))
+            labels = self._labels(key)
+            lines.append("{}_sum{} {}".format(self.name, labels, number(sample[-2])))
+            lines.append("{}_count{} {}".format(self.name, labels, sample[-1]))
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.last_flush = 0.0
+        self.reset_process()
+
+    def reset_process(self) -> None:
+        """Start samples of a new process, e.g. a worker forked by the server."""
+        # locks might have been held by other threads of the parent
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        # unique even when pids are reused, e.g. in containers
+        self.process_id = "{}-{}".format(os.getpid(), int(time.time() * 1000))
+        for metric in self.metrics.values():
+            metric.samples.clear()
+
+    def register(self, metric: Metric) -> None:
+        self.metrics[metric.name] = metric
+
+    def snapshot(self) -> Dict[str, Dict[LabelValues, object]]:
+        with self.lock:
+            return {
+                name: {
+                    key: list(value) if isinstance(value, list) else value
+                    for key, value in metric.samples.items()
+                }
+                for name, metric in self.metrics.items()
+            }
+
+    def _path(self, directory: str) -> str:
+        return os.path.join(directory, "metrics-{}.json".format(self.process_id))
+
+    def flush(self) -> None:
+        """Dump samples of this process to its file in METRICS_DIR."""
+        directory = getattr(settings, "METRICS_DIR", None)
+        if not directory:
+            return
+        self.last_flush = time.monotonic()
+        path = self._path(str(directory))
+        with self.flush_lock:
+            data = {
+                name: [[list(key), value] for key, value in samples.items()]
+                for name, samples in self.snapshot().items()
+            }
+            os.makedirs(str(directory), exist_ok=True)
+            # readers see either the previous or the new file, never a part
+            temporary_path = path + ".tmp"
+            with open(temporary_path, "w") as file:
+                json.dump(data, file)
+            os.replace(temporary_path, path)
+
+    def maybe_flush(self) -> None:
+        if time.monotonic() - self.last_flush >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def collect(self) -> Dict[str, Dict[LabelValues, object]]:
+        """Samples of all processes, or of this one without METRICS_DIR."""
+        directory = getattr(settings, "METRICS_DIR", None)
+        if not directory:
+            return self.snapshot()
+        self.flush()
+        merged: Dict[str, dict] = {name: {} for name in self.metrics}
+        expired = time.time() - settings.METRICS_FILE_RETENTION
+        for filename in os.listdir(str(directory)):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(str(directory), filename)
+            try:
+                if os.path.getmtime(path) < expired:
+                    os.remove(path)
+                    continue
+                with open(path) as file:
+                    data = json.load(file)
+            except (OSError, ValueError):
+                # removed or replaced meanwhile
+                continue
+            for name, samples in data.items():
+                if name in self.metrics:
+                    self.metrics[name].merge(
+                        merged[name], {tuple(key): value for key, value in samples}
+                    )
+        return merged
+
+    def render(self) -> str:
+        collected = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append("# HELP {} {}".format(name, metric.documentation))
+            lines.append("# TYPE {} {}".format(name, metric.kind))
+            lines.extend(metric.render(collected.get(name, {})))
+        return "\n".join(lines) + "\n"
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REGISTRY = Registry()
+atexit.register(REGISTRY.flush)
+# samples inherited from the parent process are counted in its own file
+os.register_at_fork(after_in_child=REGISTRY.reset_process)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+SIZE_BUCKETS = (100, 300, 1000, 3000, 10000, 30000, 100000, 300000, 1000000)
+REQUEST_LABELS = ("view", "action", "method")
+
+request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time spent processing the request.",
+    REQUEST_LABELS,
+    LATENCY_BUCKETS,
+)
+request_queries = Histogram(
+    "http_request_db_queries",
+    "SQL statements executed by the request.",
+    REQUEST_LABELS,
+    QUERIES_BUCKETS,
+)
+request_db_duration = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in SQL statements of the request.",
+    REQUEST_LABELS,
+    LATENCY_BUCKETS,
+)
+response_size = Histogram(
+    "http_response_size_bytes",
+    "Size of the response body.",
+    REQUEST_LABELS,
+    SIZE_BUCKETS,
+)
+responses = Counter(
+    "http_responses_total", "Responses by status code.", REQUEST_LABELS + ("status",)
+)
+games_created = Counter("games_created_total", "Games created.", ("board_size",))
+moves_played = Counter("moves_total", "Moves played.", ("board_size",))
+wins = Counter("wins_total", "Games won.", ("board_size",))
+draws = Counter("draws_total", "Games ended in a draw.", ("board_size",))
+
+
+def is_allowed(request) -> bool:
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if token and hmac.compare_digest(
+        request.META.get("HTTP_AUTHORIZATION", "").encode(),
+        "Bearer {}".format(token).encode(),
+    ):
+        return True
+    return request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS
+
+
+def metrics_view(request) -> HttpResponse:
+    if not is_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
+def count_moves(board_size: int, moves: int, has_winner: bool, is_done: bool) -> None:
+    moves_played.inc(moves, board_size=board_size)
+    if has_winner:
+        wins.inc(board_size=board_size)
+    elif is_done:
+        draws.inc(board_size=board_size)
+
+
+def labels_of(request) -> Dict[str, str]:
+    """View and action names of a request, DRF viewsets' actions included."""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return {"view": "unmatched", "action": "", "method": request.method}
+    view = getattr(match.func, "cls", None) or getattr(match.func, "view_class", None)
+    view_name = view.__name__ if view is not None else match.func.__name__
+    actions: Optional[dict] = getattr(match.func, "actions", None)
+    if actions:
+        action = actions.get(request.method.lower(), "")
+    else:
+        action = match.url_name or ""
+    return {"view": view_name, "action": action, "method": request.method}
@@ -0,0 +1,121 @@
+import asyncio
+import cProfile
+import pstats
+import time
+
+from django.db import connection
+from django.utils.decorators import sync_and_async_middleware
+
+from api import metrics, profiling
+from api.authentication import requesting_user
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """
+    Record latency, SQL statements and response size of every request,
+    labelled by view and action, see `api.metrics`.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        # served as a coroutine, long polling keeps no thread busy
+        async def middleware(request):
+            start = time.perf_counter()
+            response = await get_response(request)
+            # statements run in other threads are not seen by async views
+            record(request, response, time.perf_counter() - start, None)
+            return response
+
+    else:
+
+        def middleware(request):
+            queries = QueriesCounter()
+            start = time.perf_counter()
+            with connection.execute_wrapper(queries):
+                response = get_response(request)
+            record(request, response, time.perf_counter() - start, queries)
+            return response
+
+    return middleware
+
+
+def record(request, response, duration: float, queries) -> None:
+    labels = metrics.labels_of(request)
+    metrics.request_duration.observe(duration, **labels)
+    if queries is not None:
+        metrics.request_queries.observe(queries.count, **labels)
+        metrics.request_db_duration.observe(queries.duration, **labels)
+    if not response.streaming:
+        metrics.response_size.observe(len(response.content), **labels)
+    metrics.responses.inc(status=response.status_code, **labels)
+    metrics.REGISTRY.maybe_flush()
+
+
+class QueriesCounter:
+    """Database execute wrapper counting statements and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+@sync_and_async_middleware
+def profiling_middleware(get_response):
+    """
+    Run requests asked for by staff users, and a sample of the others, under
+    cProfile and save the profile, see `api.profiling`. Its id is sent back
+    in the `X-Profile-Id` header. Other requests only pay for the check of
+    the flag. Async views aren't profiled.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        return get_response
+
+    def middleware(request):
+        if profiling.is_requested(request):
+            if not requesting_user(request).is_staff:
+                return get_response(request)
+        elif not profiling.is_sampled():
+            return get_response(request)
+        return profile(get_response, request)
+
+    return middleware
+
+
+def profile(get_response, request):
+    from api.models import RequestProfile
+
+    queries = QueriesCounter()
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    with connection.execute_wrapper(queries):
+        profiler.enable()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.disable()
+    duration = time.perf_counter() - start
+
+    stats = pstats.Stats(profiler)
+    sections = profiling.sections_of(stats)
+    sections["orm"] = queries.duration
+    # set by the view, REST API views authenticate with tokens too
+    user = getattr(request, "user", None)
+    request_profile = RequestProfile.objects.create(
+        user=user if user is not None and user.is_authenticated else None,
+        method=request.method,
+        path=request.get_full_path()[:255],
+        status=response.status_code,
+        duration=duration,
+        queries=queries.count,
+        sections=sections,
+        stats=profiling.dump(stats),
+    )
+    response["X-Profile-Id"] = str(request_profile.id)
+    return response
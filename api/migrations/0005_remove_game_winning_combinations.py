@@ -0,0 +1,17 @@
+# Generated by Django 4.0.5 on 2026-10-18 18:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_alter_highscore_player'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='game',
+            name='winning_combinations',
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.0.5 on 2026-10-18 18:13
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_win_length(apps, schema_editor):
+    # existing games are won by filling a whole line
+    Game = apps.get_model("api", "Game")
+    Game.objects.update(win_length=F("board_size"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_remove_game_winning_combinations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='win_length',
+            field=models.IntegerField(default=3),
+        ),
+        migrations.RunPython(fill_win_length, migrations.RunPython.noop),
+    ]
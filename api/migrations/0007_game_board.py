@@ -0,0 +1,58 @@
+# Generated by Django 4.0.5 on 2026-10-18 18:14
+
+from django.db import migrations, models
+
+
+def mask_width(board_size):
+    return (board_size * board_size + 7) // 8
+
+
+def game_status_to_board(apps, schema_editor):
+    # players' masks are packed in order of their ids, see `api.engine.Board.to_bytes`
+    Game = apps.get_model("api", "Game")
+    for game in Game.objects.all().iterator():
+        width = mask_width(game.board_size)
+        board = b""
+        for player_id in sorted(game.game_status or {}, key=int):
+            mask = 0
+            for cell in game.game_status[player_id]:
+                mask |= 1 << cell
+            board += mask.to_bytes(width, "little")
+        game.board = board
+        game.save(update_fields=["board"])
+
+
+def board_to_game_status(apps, schema_editor):
+    Game = apps.get_model("api", "Game")
+    for game in Game.objects.all().iterator():
+        width = mask_width(game.board_size)
+        board = bytes(game.board)
+        player_ids = sorted(game.players.values_list("id", flat=True))
+        game_status = {}
+        for slot, player_id in enumerate(player_ids):
+            mask = int.from_bytes(board[slot * width : (slot + 1) * width], "little")
+            game_status[str(player_id)] = [
+                cell for cell in range(game.board_size**2) if mask >> cell & 1
+            ]
+        game.game_status = game_status
+        game.save(update_fields=["game_status"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_game_win_length'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='board',
+            field=models.BinaryField(default=bytes),
+        ),
+        migrations.RunPython(game_status_to_board, board_to_game_status),
+        migrations.RemoveField(
+            model_name='game',
+            name='game_status',
+        ),
+    ]
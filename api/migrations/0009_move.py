@@ -0,0 +1,33 @@
+# Generated by Django 4.0.5 on 2026-10-18 18:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_game_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Move',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cell', models.IntegerField()),
+                ('ply', models.IntegerField()),
+                ('date', models.DateTimeField(auto_now_add=True)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='moves', to='api.game')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='moves', to='api.userprofile')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='move',
+            constraint=models.UniqueConstraint(fields=('game', 'cell'), name='unique_game_cell'),
+        ),
+        migrations.AddConstraint(
+            model_name='move',
+            constraint=models.UniqueConstraint(fields=('game', 'ply'), name='unique_game_ply'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.0.5 on 2026-10-18 18:17
+
+from django.db import migrations, models
+
+
+def count_played_moves(apps, schema_editor):
+    Game = apps.get_model("api", "Game")
+    for game in Game.objects.all().iterator():
+        game.ply = bin(int.from_bytes(bytes(game.board), "little")).count("1")
+        game.save(update_fields=["ply"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_move'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='ply',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_played_moves, migrations.RunPython.noop),
+    ]
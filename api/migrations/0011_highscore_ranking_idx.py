@@ -0,0 +1,17 @@
+# Generated by Django 4.0.5 on 2026-10-18 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_game_ply'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='highscore',
+            index=models.Index(fields=['moves_count', 'duration_time'], name='highscore_ranking_idx'),
+        ),
+    ]
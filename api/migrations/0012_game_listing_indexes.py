@@ -0,0 +1,21 @@
+# Generated by Django 4.0.5 on 2026-10-18 18:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_highscore_ranking_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['is_done', '-id'], name='game_is_done_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['board_size', '-id'], name='game_board_size_idx'),
+        ),
+    ]
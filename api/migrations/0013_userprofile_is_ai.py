@@ -0,0 +1,18 @@
+# Generated by Django 4.0.5 on 2026-10-18 18:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_game_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='is_ai',
+            field=models.BooleanField(default=False),
+        ),
+    ]
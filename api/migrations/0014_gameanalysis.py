@@ -0,0 +1,23 @@
+# Generated by Django 4.0.5 on 2026-10-18 18:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_userprofile_is_ai'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameAnalysis',
+            fields=[
+                ('game', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='analysis', serialize=False, to='api.game')),
+                ('decided_at', models.IntegerField(null=True)),
+                ('moves', models.JSONField(default=list)),
+                ('date', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
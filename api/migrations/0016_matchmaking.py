@@ -0,0 +1,32 @@
+# Generated by Django 4.0.5 on 2026-10-18 18:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_requestprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='rating',
+            field=models.IntegerField(default=1200),
+        ),
+        migrations.CreateModel(
+            name='MatchRequest',
+            fields=[
+                ('player', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='match_request', serialize=False, to='api.userprofile')),
+                ('board_size', models.IntegerField(default=3)),
+                ('win_length', models.IntegerField(default=3)),
+                ('rating', models.IntegerField()),
+                ('rating_band', models.IntegerField()),
+                ('date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('game', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.game')),
+            ],
+        ),
+    ]
@@ -1,3 +1,12 @@
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK, HTTP_304_NOT_MODIFIED
+
+
 class SerializerActionClassMixin(object):
     """
     A class which inhertis this mixins should have variable
@@ -13,3 +22,61 @@ class SerializerActionClassMixin(object):
             return self.serializer_action_classes[self.action]
         except (KeyError, AttributeError):
             return super(SerializerActionClassMixin, self).get_serializer_class()
+
+
+class VersionETagMixin(object):
+    """
+    A class which inherits this mixin serves strong ETags of `retrieve` and
+    `list` derived from `id` and `version` fields of objects, and answers
+    `If-None-Match` with 304 Not Modified. The check reads only those fields,
+    nothing is serialized unless the representation changed.
+    `version` has to be incremented on every change of an object.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            versions = list(
+                self._versions(self.get_queryset()).filter(
+                    **{self.lookup_field: kwargs[lookup_url_kwarg]}
+                )
+            )
+        except (TypeError, ValueError, ValidationError):
+            # malformed lookup, as handled by `get_object_or_404`
+            raise Http404
+        return self._conditional(
+            request, versions, super(VersionETagMixin, self).retrieve, *args, **kwargs
+        )
+
+    def list(self, request, *args, **kwargs):
+        versions = self._versions(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(versions)
+        return self._conditional(
+            request,
+            list(versions) if page is None else page,
+            super(VersionETagMixin, self).list,
+            *args,
+            **kwargs
+        )
+
+    def _versions(self, queryset):
+        return queryset.select_related(None).prefetch_related(None).values(
+            "id", "version"
+        )
+
+    def _conditional(self, request, versions, view, *args, **kwargs):
+        etag = '"{}"'.format(
+            hashlib.md5(
+                "{} {}".format(
+                    request.get_full_path(),
+                    [(row["id"], row["version"]) for row in versions],
+                ).encode()
+            ).hexdigest()
+        )
+        if_none_match = parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+        if versions and (etag in if_none_match or "*" in if_none_match):
+            return Response(status=HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        response = view(request, *args, **kwargs)
+        if response.status_code == HTTP_200_OK:
+            response["ETag"] = etag
+        return response
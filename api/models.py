@@ -1,9 +1,16 @@
+from typing import Dict, List
+
+from django.core.cache import cache
 from django.utils import timezone
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext as _
 from django.conf import settings
 
+from api.engine import Board, winning_lines
+
+LEADERBOARD_CACHE_KEY = "leaderboard"
+
 
 
 class User(AbstractUser):
@@ -26,10 +33,29 @@ class UserProfile(models.Model):
     country = models.CharField(max_length=50)
     city = models.CharField(max_length=50)
     phone = models.CharField(max_length=40, blank=True)
+    # computer player, its moves are chosen by `api.engine.search`
+    is_ai = models.BooleanField(default=False)
+    # skill estimate, players are matched with others of similar rating
+    rating = models.IntegerField(default=1200)
 
     def __str__(self) -> str:
         return "profile: {} ({})".format(self.title, self.user.email)
 
+    @classmethod
+    def get_ai_player(cls) -> "UserProfile":
+        """Return profile of the computer player, created on first use."""
+        user, created = User.objects.get_or_create(
+            email=settings.AI_PLAYER_EMAIL,
+            defaults={"username": "computer", "first_name": "Computer"},
+        )
+        if created:
+            user.set_unusable_password()
+            user.save(update_fields=["password"])
+        profile, _created = cls.objects.get_or_create(
+            user=user, defaults={"title": "Computer", "is_ai": True}
+        )
+        return profile
+
 
 class HighScore(models.Model):
     player = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name="highscores")
@@ -37,12 +63,30 @@ class HighScore(models.Model):
     duration_time = models.DurationField(blank=True)
     moves_count = models.IntegerField(default=1)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["moves_count", "duration_time"], name="highscore_ranking_idx"
+            ),
+        ]
+
     def save(self, *args, **kwargs):
-        """On save, update timestamps"""
+        """On save, update timestamps and invalidate cached leaderboard"""
         if not self.id:
             self.date = timezone.now()
 
-        return super(HighScore, self).save(*args, **kwargs)
+        result = super(HighScore, self).save(*args, **kwargs)
+        transaction.on_commit(invalidate_leaderboard)
+        return result
+
+    def delete(self, *args, **kwargs):
+        result = super(HighScore, self).delete(*args, **kwargs)
+        transaction.on_commit(invalidate_leaderboard)
+        return result
+
+
+def invalidate_leaderboard() -> None:
+    cache.delete(LEADERBOARD_CACHE_KEY)
 
 
 class Game(models.Model):
@@ -53,7 +97,7 @@ class Game(models.Model):
     max_players_number = models.IntegerField(default=2)
     created_date = models.DateTimeField(auto_now=True, blank=True)
     board_size = models.IntegerField(default=3)
-    winning_combinations = models.JSONField(null=True, default=list)
+    win_length = models.IntegerField(default=3)
     # finish informations
     is_done = models.BooleanField(default=False)
     has_winner = models.BooleanField(default=False)
@@ -66,4 +110,139 @@ class Game(models.Model):
         null=True,
         related_name="current_player",
     )
-    game_status = models.JSONField(null=True, blank=True, default=dict)
+    # moves of players packed by `api.engine.Board.to_bytes`, in order of `player_ids`
+    board = models.BinaryField(default=bytes)
+    # number of moves played so far
+    ply = models.PositiveIntegerField(default=0)
+    # incremented on every move, guards against concurrent updates
+    version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # back filters of the newest first game listing
+        indexes = [
+            models.Index(fields=["is_done", "-id"], name="game_is_done_idx"),
+            models.Index(fields=["board_size", "-id"], name="game_board_size_idx"),
+        ]
+
+    @property
+    def winning_combinations(self):
+        """Shared, process-wide table of winning lines for this board."""
+        return winning_lines(self.board_size, self.win_length)
+
+    @property
+    def player_ids(self) -> List[int]:
+        """Ids of players, ordered as their masks on the board."""
+        return sorted(player.id for player in self.players.all())
+
+    @property
+    def ai_player_ids(self) -> List[int]:
+        """Ids of computer players, see `UserProfile.is_ai`."""
+        return [player.id for player in self.players.all() if player.is_ai]
+
+    @property
+    def game_status(self) -> Dict[str, List[int]]:
+        """Played cells per player id, the shape exposed by the API."""
+        return self.get_game_status(self.player_ids)
+
+    def get_game_status(self, player_ids: List[int]) -> Dict[str, List[int]]:
+        """
+        Cells are read from the board so they're listed in ascending order,
+        not in the order they were played, which `Move` rows keep.
+        """
+        board = self.get_board()
+        return {
+            str(player_id): board.cells_of(slot)
+            for slot, player_id in enumerate(player_ids)
+        }
+
+    def get_board(self) -> Board:
+        return Board.from_bytes(self.board_size, self.board, self.win_length)
+
+    def set_board(self, board: Board) -> None:
+        self.board = board.to_bytes()
+
+
+class Move(models.Model):
+    """Append-only history of moves, the board on `Game` is its summary."""
+
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name="moves")
+    player = models.ForeignKey(
+        UserProfile, on_delete=models.CASCADE, related_name="moves"
+    )
+    cell = models.IntegerField()
+    ply = models.IntegerField()
+    date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["game", "cell"], name="unique_game_cell"),
+            models.UniqueConstraint(fields=["game", "ply"], name="unique_game_ply"),
+        ]
+
+
+class GameAnalysis(models.Model):
+    """
+    Evaluation of every move of a finished game, see `api.engine.analysis`.
+    Finished games never change, so it's computed once.
+    """
+
+    game = models.OneToOneField(
+        Game, on_delete=models.CASCADE, primary_key=True, related_name="analysis"
+    )
+    # ply from which the result of the game didn't change
+    decided_at = models.IntegerField(null=True)
+    moves = models.JSONField(default=list)
+    date = models.DateTimeField(auto_now_add=True)
+
+
+class RequestProfile(models.Model):
+    """Profile of one request, see `api.middleware.profiling_middleware`."""
+
+    date = models.DateTimeField(auto_now_add=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="+",
+    )
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=255)
+    status = models.PositiveSmallIntegerField()
+    # seconds spent by the whole request
+    duration = models.FloatField()
+    queries = models.PositiveIntegerField()
+    # seconds spent in serializer hot spots and in SQL statements
+    sections = models.JSONField(default=dict)
+    # `pstats` data, as written by `pstats.Stats.dump_stats`
+    stats = models.BinaryField()
+
+
+class MatchRequest(models.Model):
+    """
+    Player waiting for an opponent, see `api.matchmaking`. Rows outlive the
+    in-memory queues, which are rebuilt from the waiting ones at start. Once
+    matched, the game is kept here for the player to find it.
+    """
+
+    player = models.OneToOneField(
+        UserProfile,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="match_request",
+    )
+    board_size = models.IntegerField(default=3)
+    win_length = models.IntegerField(default=3)
+    # rating of the player when enqueued
+    rating = models.IntegerField()
+    # the largest accepted difference of ratings
+    rating_band = models.IntegerField()
+    # time of the last enqueue, the longest waiting players are matched first
+    date = models.DateTimeField(default=timezone.now)
+    game = models.ForeignKey(
+        Game, on_delete=models.SET_NULL, blank=True, null=True, related_name="+"
+    )
+
+    @property
+    def is_waiting(self) -> bool:
+        return self.game_id is None
@@ -0,0 +1,15 @@
+from rest_framework.pagination import CursorPagination
+
+
+class GameCursorPagination(CursorPagination):
+    """
+    Newest games first. Cursor keeps the cost of a page constant however
+    deep the client pages, unlike offset pagination.
+    """
+
+    page_size = 50
+    ordering = "-id"
+
+
+class RequestProfileCursorPagination(GameCursorPagination):
+    """Newest profiles first."""
@@ -0,0 +1,61 @@
+"""
+Opt-in profiling of single requests. Staff users ask for it with the
+`X-Profile` header or the `profile` query parameter, besides that a fraction
+of all requests is profiled, see `PROFILING_SAMPLE_RATE`. Profiles are kept
+as `RequestProfile` and served at `/api/profiles/`.
+"""
+import io
+import marshal
+import pstats
+import random
+from typing import Dict, List
+
+from django.conf import settings
+
+HEADER = "HTTP_X_PROFILE"
+QUERY_PARAMETER = "profile"
+
+# serializer methods timed apart in every profile
+SECTIONS = ("validate_move", "process_move")
+SECTIONS_FILE = "serializers.py"
+
+
+def is_requested(request) -> bool:
+    """Cheap check of the flag, users are authenticated only when it's set."""
+    return HEADER in request.META or (
+        QUERY_PARAMETER in request.META.get("QUERY_STRING", "")
+        and QUERY_PARAMETER in request.GET
+    )
+
+
+def is_sampled() -> bool:
+    rate = settings.PROFILING_SAMPLE_RATE
+    return bool(rate) and random.random() < rate
+
+
+def sections_of(stats: pstats.Stats) -> Dict[str, float]:
+    """Cumulative seconds spent in every method of `SECTIONS`."""
+    sections = dict.fromkeys(SECTIONS, 0.0)
+    for (filename, _line, function), entry in stats.stats.items():
+        if function in sections and filename.endswith(SECTIONS_FILE):
+            sections[function] += entry[3]
+    return sections
+
+
+def dump(stats: pstats.Stats) -> bytes:
+    """Serialize stats the way `pstats.Stats.dump_stats` writes them."""
+    return marshal.dumps(stats.stats)
+
+
+def load(data: bytes, stream=None) -> pstats.Stats:
+    stats = pstats.Stats(stream=stream)
+    stats.stats = marshal.loads(bytes(data))
+    stats.get_top_level_stats()
+    return stats
+
+
+def top_functions(data: bytes, limit: int = 30) -> List[str]:
+    """Report of functions taking the most cumulative time."""
+    stream = io.StringIO()
+    load(data, stream).sort_stats("cumulative").print_stats(limit)
+    return [line for line in stream.getvalue().splitlines() if line.strip()]
@@ -1,7 +1,25 @@
-from typing import List
+from typing import Iterable, List, Optional, Tuple
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, prefetch_related_objects
 from django.forms import ValidationError
 from rest_framework import serializers
-from api.models import Game, HighScore, UserProfile
+from rest_framework.utils.serializer_helpers import ReturnList
+from api.engine import Board, mcts
+from api.engine.analysis import analyse_games
+from api.engine.search import best_move
+from api.engine.tablebase import load_tablebase
+from api import matchmaking, metrics, profiling
+from api.events import game_events, publish_events
+from api.models import (
+    Game,
+    GameAnalysis,
+    HighScore,
+    MatchRequest,
+    Move,
+    RequestProfile,
+    UserProfile,
+)
 
 from django.utils import timezone
 from gettext import gettext as _
@@ -21,77 +39,281 @@ class DashboardSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class GamePlaySerializer(serializers.ModelSerializer):
-    players = serializers.PrimaryKeyRelatedField(
-        many=True, queryset=UserProfile.objects.all()
+class GameFilterSerializer(serializers.Serializer):
+    """Query parameters accepted when listing games."""
+
+    player = serializers.IntegerField(required=False)
+    is_done = serializers.BooleanField(required=False)
+    board_size = serializers.IntegerField(required=False)
+
+    def filter_queryset(self, queryset):
+        filters = dict(self.validated_data)
+        if "player" in filters:
+            filters["players"] = filters.pop("player")
+        return queryset.filter(**filters)
+
+
+def check_players_registered(players: Iterable[int]) -> None:
+    """Check that all players are registered and active, in a single query."""
+    is_active = dict(
+        UserProfile.objects.filter(id__in=set(players)).values_list(
+            "id", "user__is_active"
+        )
+    )
+    for player in players:
+        if player not in is_active:
+            raise ValidationError(
+                _("Player (id: {}) must be registered.").format(player)
+            )
+        elif not is_active[player]:
+            raise ValidationError(_("Player (id: {}) is inactive.").format(player))
+
+
+def validate_board_settings(attrs: dict) -> dict:
+    board_size = attrs.setdefault(
+        "board_size", Game._meta.get_field("board_size").default
     )
+    if not 0 < board_size <= settings.MAX_BOARD_SIZE:
+        raise serializers.ValidationError(
+            {
+                "board_size": _("Board size must be between 1 and {}.").format(
+                    settings.MAX_BOARD_SIZE
+                )
+            }
+        )
+    # by default the whole row, column or diagonal has to be filled
+    win_length = attrs.setdefault("win_length", board_size)
+    if not 0 < win_length <= board_size:
+        raise serializers.ValidationError(
+            {"win_length": _("Win length must be between 1 and board size.")}
+        )
+    return attrs
+
+
+def choose_move(board: Board, player: int) -> Tuple[int, Optional[str]]:
+    """
+    Best cell for the player in given slot and the outcome of the game with
+    perfect play, when known. 3x3 positions are read from the tablebase
+    built by `manage.py build_tablebase`, big boards are left to Monte Carlo
+    tree search and the others are searched by negamax.
+    """
+    tablebase = load_tablebase(str(settings.TABLEBASE_PATH))
+    if tablebase is not None and tablebase.covers(board):
+        cell, outcome = tablebase.lookup(board, player)
+        if cell is not None:
+            return cell, outcome
+    if board.size >= settings.MCTS_MIN_BOARD_SIZE:
+        cell = mcts.best_move(
+            board,
+            player,
+            settings.MCTS_SIMULATIONS,
+            settings.MCTS_WORKERS,
+            settings.MCTS_TIME_BUDGET,
+        )
+        return cell, None
+    return best_move(board, player, settings.AI_MOVE_TIME_BUDGET), None
+
+
+class PlayersField(serializers.ListField):
+    """
+    Ids of players. Unlike `PrimaryKeyRelatedField` it doesn't look up players
+    one by one, `GamePlaySerializer.validate_players` checks them together.
+    """
+
+    child = serializers.IntegerField()
+
+    def to_representation(self, players):
+        return [player.pk for player in players.all()]
+
+
+class GamePlaySerializer(serializers.ModelSerializer):
+    players = PlayersField()
     winning_combinations = serializers.ListField(
-        child=serializers.ListField(child=serializers.IntegerField(required=False)),
-        required=False,
+        child=serializers.ListField(child=serializers.IntegerField()),
+        read_only=True,
     )
     winner_combination = serializers.ListField(
         child=serializers.IntegerField(required=False), required=False
     )
+    game_status = serializers.DictField(
+        child=serializers.ListField(child=serializers.IntegerField()),
+        read_only=True,
+    )
+    # play against the computer, which joins as the second player
+    ai = serializers.BooleanField(write_only=True, required=False)
 
     class Meta:
         model = Game
-        fields = "__all__"
+        exclude = ("board",)
+        read_only_fields = ("current_player", "ply", "version")
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # one entry per winning segment, tens of thousands on big boards, so
+        # sent only on request, e.g. `?winning_combinations=true`
+        request = self.context.get("request")
+        requested = request is not None and request.query_params.get(
+            "winning_combinations"
+        ) in serializers.BooleanField.TRUE_VALUES
+        if not requested:
+            fields.pop("winning_combinations")
+        return fields
 
-    def validate_players(self, players):
-        all_players = UserProfile.objects.all()
-        if len(players) > int(self.initial_data["max_players_number"]):
+    def validate_players(self, players: List[int]) -> List[int]:
+        if self._with_ai():
+            players = players + [UserProfile.get_ai_player().id]
+        max_players_number = self.initial_data.get(
+            "max_players_number", Game._meta.get_field("max_players_number").default
+        )
+        if len(players) > int(max_players_number):
             raise ValidationError(_("Maximum count of players reached."))
         elif len(players) < 2:
             raise ValidationError(_("Not enough players."))
         elif len(players) > 2:
             raise ValidationError(_("For now, this game is ready for two players only."))
-        for player in players:
-            if player not in all_players:
-                raise ValidationError(
-                    _("Player (id: {}) must be registered.").format(player.id)
-                )
+        elif len(set(players)) < len(players):
+            raise ValidationError(_("Players must be different."))
+        check_players_registered(players)
         return players
 
+    def validate(self, attrs):
+        if self.instance is None:
+            return validate_board_settings(attrs)
+        # the board is packed for its size, settings are fixed at creation
+        for field in ("board_size", "win_length"):
+            if field in attrs and attrs[field] != getattr(self.instance, field):
+                raise serializers.ValidationError(
+                    {field: _("Board settings can't be changed after creation.")}
+                )
+        return attrs
+
+    def _with_ai(self) -> bool:
+        try:
+            return serializers.BooleanField().to_internal_value(
+                self.initial_data.get("ai", False)
+            )
+        except serializers.ValidationError:
+            # reported by the `ai` field itself
+            return False
+
     def create(self, validated_data):
-        all_possible_moves, validated_data = self._setup(validated_data)
-        players = validated_data.pop("players")
-        game = super().create(validated_data)
-        game.players.set(players)
-        game.current_player = players[0]
-        game.created_date = timezone.now()
-        players_id = [player.id for player in players]
-        game.game_status = {value: [] for value in players_id}
-        game.winning_combinations = self._get_winning_combinations(all_possible_moves)
-        game.save()
+        validated_data = self._setup(validated_data)
+        with transaction.atomic():
+            game = super().create(validated_data)
+            transaction.on_commit(
+                lambda: metrics.games_created.inc(board_size=game.board_size)
+            )
+        # players are read by both `players` and `game_status` fields
+        prefetch_related_objects([game], "players")
         log.info(_("Good luck to both of you. Let's the game begin!"))
         return game
 
+    def update(self, instance, validated_data):
+        """
+        Write only the sent fields, applied like moves only if nobody changed
+        the game since it was read, see `save_moves`. Every change of the
+        game invalidates its ETag.
+        """
+        validated_data.pop("ai", None)
+        players = validated_data.pop("players", None)
+        with transaction.atomic():
+            updated = Game.objects.filter(
+                pk=instance.pk, version=instance.version
+            ).update(version=F("version") + 1, **validated_data)
+            if not updated:
+                raise serializers.ValidationError(
+                    _("Game was updated in the meantime, try again.")
+                )
+            if players is not None:
+                instance.players.set(players)
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.version += 1
+        return instance
+
     def _setup(self, validated_data: dict):
+        # computer player was already added to players
+        validated_data.pop("ai", None)
         # set players
-        validated_data["current_player"] = validated_data["players"][0]
+        validated_data["current_player_id"] = validated_data["players"][0]
         # set created_date
         validated_data["created_date"] = timezone.now()
-        # define how to store moves
-        all_possible_moves = [k for k in range(validated_data["board_size"] ** 2)]
-        # setup players status
-        players_id = [player.id for player in validated_data["players"]]
-        validated_data["game_status"] = {value: [] for value in players_id}
-        return all_possible_moves, validated_data
-
-    def _get_winning_combinations(self, all_possible_moves: List[int]) -> List[List[int]]:
-        length = len(all_possible_moves)
-        col_number = int(self.initial_data["board_size"])
-        columns = [
-            all_possible_moves[
-                i * length // col_number : (i + 1) * length // col_number
-            ]
-            for i in range(col_number)
+        # setup empty board
+        validated_data["board"] = Board(
+            validated_data["board_size"], win_length=validated_data["win_length"]
+        ).to_bytes()
+        return validated_data
+
+
+class GameBulkCreateSerializer(serializers.Serializer):
+    """
+    Create many games, e.g. a tournament bracket, with the same board settings.
+    Players of all pairings are validated together and games are inserted
+    with a few bulk queries.
+    """
+
+    pairings = serializers.ListField(
+        child=serializers.ListField(
+            child=serializers.IntegerField(), min_length=2, max_length=2
+        ),
+        allow_empty=False,
+    )
+    board_size = serializers.IntegerField(required=False)
+    win_length = serializers.IntegerField(required=False)
+
+    batch_size = 1000
+
+    def validate_pairings(self, pairings: List[List[int]]) -> List[List[int]]:
+        for players in pairings:
+            if players[0] == players[1]:
+                raise ValidationError(_("Players must be different."))
+        check_players_registered([player for players in pairings for player in players])
+        return pairings
+
+    def validate(self, attrs):
+        return validate_board_settings(attrs)
+
+    def create(self, validated_data):
+        board_size = validated_data["board_size"]
+        win_length = validated_data["win_length"]
+        board = Board(board_size, win_length=win_length).to_bytes()
+        created_date = timezone.now()
+        games = [
+            Game(
+                board_size=board_size,
+                win_length=win_length,
+                current_player_id=players[0],
+                created_date=created_date,
+                board=board,
+            )
+            for players in validated_data["pairings"]
+        ]
+        GamePlayers = Game.players.through
+        with transaction.atomic():
+            Game.objects.bulk_create(games, batch_size=self.batch_size)
+            GamePlayers.objects.bulk_create(
+                [
+                    GamePlayers(game_id=game.id, userprofile_id=player)
+                    for game, players in zip(games, validated_data["pairings"])
+                    for player in players
+                ],
+                batch_size=self.batch_size,
+            )
+            transaction.on_commit(
+                lambda: metrics.games_created.inc(len(games), board_size=board_size)
+            )
+        log.info(_("{} games created.").format(len(games)))
+        return games
+
+    @property
+    def data(self):
+        return ReturnList(self.to_representation(self.instance), serializer=self)
+
+    def to_representation(self, games):
+        return [
+            {"id": game.id, "players": players}
+            for game, players in zip(games, self.validated_data["pairings"])
         ]
-        rows = [list(col) for col in zip(*columns)]
-        first_diagonal = [row[i] for i, row in enumerate(rows)]
-        second_diagonal = [col[j] for j, col in enumerate(reversed(columns))]
-        winning_combinations = rows + columns + [first_diagonal, second_diagonal]
-        return winning_combinations
 
 
 class GamePlayPartialUpdateSerializer(serializers.ModelSerializer):
@@ -111,13 +333,15 @@ class GamePlayPartialUpdateSerializer(serializers.ModelSerializer):
         model = Game
         fields = ("move",)
 
+    _board = None
+    _player_ids = None
+
     def validate_move(self, move: int) -> int:
-        moves_list = list(self.instance.game_status.values())
-        move_was_not_played = move not in [obj for list in moves_list for obj in list]
-        move_is_in_current = move in [k for k in range(self.instance.board_size**2)]
+        board = self._get_board()
         no_winner = not self.instance.has_winner
 
-        if no_winner and move_was_not_played and move_is_in_current:
+        # null is accepted by the field, but isn't a cell
+        if no_winner and move is not None and board.is_legal(move):
             return move
         elif not no_winner:
             raise serializers.ValidationError(_("This game is over."))
@@ -125,61 +349,423 @@ class GamePlayPartialUpdateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(_("Move is not valid."))
 
     def to_representation(self, value):
-        return value.game_status
+        return value.get_game_status(self._get_player_ids())
 
     def update(self, instance, validated_data):
-        self.process_move(validated_data["move"])
-        if self.is_tied():
-            instance.is_done = True
-            instance.save()
-            log.info(_("Game draw! Feel free to try again. Good luck!"))
-            return instance
-        elif instance.has_winner == True:
-            time_stop = timezone.now()
-            duration = time_stop - instance.created_date
-            moves = len(instance.game_status[str(instance.current_player.id)])
-            HighScore.objects.create(
-                player=instance.current_player,
-                duration_time=duration,
-                moves_count=moves,
-            )
+        moves = [self.apply_move(validated_data["move"])]
+        if self.is_ai_turn():
+            # the computer answers right away, both moves are saved together
+            moves.append(self.apply_move(self.ai_move()))
+        self.save_moves(moves)
+        self.log_result()
+        return instance
+
+    def apply_move(self, cell: int) -> Move:
+        """Process the move of the current player and return its history entry."""
+        move = Move(
+            game=self.instance,
+            player_id=self.instance.current_player_id,
+            cell=cell,
+            ply=self.instance.ply,
+        )
+        self.process_move(cell)
+        return move
+
+    def is_ai_turn(self) -> bool:
+        instance = self.instance
+        return (
+            self.context.get("ai_replies", True)
+            and not instance.is_done
+            and instance.current_player_id in instance.ai_player_ids
+        )
+
+    def ai_move(self) -> int:
+        """Cell chosen by the computer player for the current turn."""
+        player = self._get_player_ids().index(self.instance.current_player_id)
+        return choose_move(self._get_board(), player)[0]
+
+    def process_move(self, move: int) -> None:
+        """
+        Process the current move: check if it's a win or a draw and pass
+        the turn otherwise. Nothing is written until `save_moves`.
+        """
+        player_ids = self._get_player_ids()
+        player = player_ids.index(self.instance.current_player_id)
+        board = self._get_board()
+        board.play(player, move)
+        self.instance.set_board(board)
+        self.instance.ply += 1
+        winner_combination = board.winning_line(player, move)
+        if winner_combination:
+            self.instance.has_winner = True
+            self.instance.winner_combination = winner_combination
+            self.instance.is_done = True
+        elif self.is_tied():
+            self.instance.is_done = True
+        else:
+            self.instance.current_player_id = player_ids[(player + 1) % len(player_ids)]
+
+    def save_moves(self, moves: List[Move]) -> None:
+        """
+        Append moves to the history and write the game with a single UPDATE,
+        applied only if nobody changed it since it was read, so concurrent
+        moves can't both pass validation.
+        """
+        instance = self.instance
+        try:
+            with transaction.atomic():
+                Move.objects.bulk_create(moves)
+                updated = Game.objects.filter(
+                    pk=instance.pk, version=instance.version
+                ).update(
+                    board=instance.board,
+                    is_done=instance.is_done,
+                    has_winner=instance.has_winner,
+                    winner_combination=instance.winner_combination,
+                    current_player_id=instance.current_player_id,
+                    ply=instance.ply,
+                    version=F("version") + 1,
+                )
+                if not updated:
+                    raise serializers.ValidationError(
+                        _("Game was updated in the meantime, try again.")
+                    )
+                instance.version += 1
+                winner = instance.current_player_id if instance.has_winner else None
+                if winner and winner not in instance.ai_player_ids:
+                    self.save_highscore()
+                events = game_events(instance, self._get_player_ids())
+                transaction.on_commit(lambda: publish_events(instance.id, events))
+                transaction.on_commit(
+                    lambda: metrics.count_moves(
+                        instance.board_size,
+                        len(moves),
+                        instance.has_winner,
+                        instance.is_done,
+                    )
+                )
+        except IntegrityError:
+            # the cell or the turn was taken by a concurrent request
+            raise serializers.ValidationError(_("Move is not valid."))
+
+    def log_result(self) -> None:
+        instance = self.instance
+        if instance.has_winner:
             log.info(
                 _("Congrats for player {}! Good game! Feel free to try again.").format(
-                    instance.current_player
+                    instance.current_player_id
                 )
             )
-            return instance
+        elif instance.is_done:
+            log.info(_("Game draw! Feel free to try again. Good luck!"))
         else:
-            instance.current_player = instance.players.exclude(
-                id=instance.current_player.id
-            )[0]
-            instance.save()
-            log.info(_("Player's {} turn.").format(instance.current_player))
-            return instance
+            log.info(_("Player's {} turn.").format(instance.current_player_id))
 
-    def process_move(self, move: int) -> None:
-        """Process the current move and check if it's a win."""
-        player_id = self.instance.current_player.id
-        self.instance.game_status[str(player_id)].append(move)
-        self.instance.save()
-        for combo in self.instance.winning_combinations:
-            played_moves = self.instance.game_status[str(player_id)]
-            is_win = all(item in played_moves for item in combo)
-            if is_win:
-                self.instance.has_winner = True
-                self.instance.winner_combination = combo
-                self.instance.is_done = True
-                self.instance.save()
-                break
-            continue
+    def save_highscore(self) -> None:
+        instance = self.instance
+        duration = timezone.now() - instance.created_date
+        moves = self._get_board().moves_count(
+            self._get_player_ids().index(instance.current_player_id)
+        )
+        HighScore.objects.create(
+            player_id=instance.current_player_id,
+            duration_time=duration,
+            moves_count=moves,
+        )
 
     def is_tied(self) -> bool:
         """Return True if the game is tied, and False otherwise."""
-        no_winner = not self.instance.has_winner
+        instance = self.instance
+        return not instance.has_winner and instance.ply == instance.board_size**2
+
+    def _get_board(self) -> Board:
+        """Return bitboard of the game, loaded once per serializer."""
+        if self._board is None:
+            self._board = self.instance.get_board()
+        return self._board
+
+    def _get_player_ids(self) -> List[int]:
+        if self._player_ids is None:
+            self._player_ids = self.instance.player_ids
+        return self._player_ids
+
+
+class GamePlayMovesSerializer(GamePlayPartialUpdateSerializer):
+    """
+    Serializer responsible for many moves sent at once, e.g. by bots or clients
+    on slow links. Moves are played in order, alternately by players, until
+    the first illegal move or the end of the game, and written in a single
+    transaction. `stopped_at` is the index of the first move not played.
+    In games against the computer it answers every move.
+    """
+
+    move = None
+    moves = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+    class Meta:
+        model = Game
+        fields = ("moves",)
+
+    stopped_at = 0
+
+    def validate_moves(self, moves: List[int]) -> List[int]:
+        if self.instance.is_done:
+            raise serializers.ValidationError(_("This game is over."))
+        return moves
+
+    def update(self, instance, validated_data):
+        board = self._get_board()
+        moves = []
+        for cell in validated_data["moves"]:
+            if instance.is_done or not board.is_legal(cell):
+                break
+            moves.append(self.apply_move(cell))
+            self.stopped_at += 1
+            if self.is_ai_turn():
+                moves.append(self.apply_move(self.ai_move()))
+        if moves:
+            self.save_moves(moves)
+            self.log_result()
+        return instance
+
+    def to_representation(self, value):
+        return {
+            "game_status": super().to_representation(value),
+            "stopped_at": self.stopped_at,
+            "current_player": value.current_player_id,
+            "is_done": value.is_done,
+            "has_winner": value.has_winner,
+            "winner_combination": value.winner_combination,
+            "version": value.version,
+        }
+
+
+class GameHintSerializer(serializers.BaseSerializer):
+    """Suggested move of the current player and the expected outcome."""
+
+    def to_representation(self, game):
+        if game.is_done:
+            raise serializers.ValidationError(_("This game is over."))
+        player = game.player_ids.index(game.current_player_id)
+        cell, outcome = choose_move(game.get_board(), player)
+        return {"move": cell, "outcome": outcome}
+
+
+class GameAnalysisSerializer(serializers.ModelSerializer):
+    """
+    Every move of a finished game with the best alternative and a judgement,
+    `mistake` for a missed win and `blunder` for a lost game.
+    """
+
+    class Meta:
+        model = GameAnalysis
+        fields = ("game", "decided_at", "moves")
+
+    @classmethod
+    def analyse(
+        cls, games: List[Game], workers: Optional[int] = None
+    ) -> List[GameAnalysis]:
+        """
+        Analyse finished games from their history, moves of all games are
+        evaluated together in the worker pool. Analyses are saved, a game
+        analysed meanwhile by another request is left as it is. Games whose
+        history isn't complete, e.g. played before moves were recorded, are
+        skipped.
+        """
+        prefetch_related_objects(games, "moves")
+        games = [game for game in games if len(game.moves.all()) == game.ply]
+        prefetch_related_objects(games, "players")
+        results = analyse_games(
+            [(game.board_size, game.win_length) for game in games],
+            [
+                [
+                    (game.player_ids.index(move.player_id), move.cell)
+                    for move in sorted(game.moves.all(), key=lambda move: move.ply)
+                ]
+                for game in games
+            ],
+            depth=settings.ANALYSIS_DEPTH,
+            workers=workers or settings.ANALYSIS_WORKERS,
+        )
+        analyses = []
+        for game, result in zip(games, results):
+            player_ids = game.player_ids
+            for move in result["moves"]:
+                move["player"] = player_ids[move["player"]]
+            analyses.append(
+                GameAnalysis(
+                    game=game, decided_at=result["decided_at"], moves=result["moves"]
+                )
+            )
+        GameAnalysis.objects.bulk_create(analyses, ignore_conflicts=True)
+        return analyses
+
+
+class GameReplaySerializer(serializers.Serializer):
+    """
+    Replay moves into a fresh game of the same players and board settings.
+    Moves default to the history recorded for the game given in context.
+    """
+
+    moves = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    def create(self, validated_data):
+        source = self.context["game"]
+        history = list(source.moves.order_by("ply").values_list("player_id", "cell"))
+        moves = validated_data.get("moves", [cell for _player, cell in history])
+        if not moves:
+            raise serializers.ValidationError({"moves": _("No moves to replay.")})
+        # the player who started the recorded game starts again
+        first_player = history[0][0] if history else source.current_player_id
+        players = [first_player] + [
+            player for player in source.player_ids if player != first_player
+        ]
+        with transaction.atomic():
+            game_serializer = GamePlaySerializer(
+                data={
+                    "players": players,
+                    "max_players_number": source.max_players_number,
+                    "board_size": source.board_size,
+                    "win_length": source.win_length,
+                },
+                context=self.context,
+            )
+            game_serializer.is_valid(raise_exception=True)
+            game = game_serializer.save()
+            # recorded moves of a computer player are replayed as they were
+            self.moves_serializer = GamePlayMovesSerializer(
+                game, data={"moves": moves}, context={**self.context, "ai_replies": False}
+            )
+            self.moves_serializer.is_valid(raise_exception=True)
+            self.moves_serializer.save()
+        return game
+
+    def to_representation(self, game):
+        return {"id": game.id, **self.moves_serializer.data}
+
+
+class MatchRequestSerializer(serializers.ModelSerializer):
+    """
+    Enqueue the requesting player for a game against an opponent of similar
+    rating, see `api.matchmaking`. When one is waiting the game is created
+    right away, otherwise the player reads the request until it's matched.
+    """
+
+    rating_band = serializers.ChoiceField(
+        choices=settings.MATCHMAKING_RATING_BANDS,
+        default=settings.MATCHMAKING_DEFAULT_RATING_BAND,
+    )
+    status = serializers.SerializerMethodField()
+
+    class Meta:
+        model = MatchRequest
+        fields = (
+            "player",
+            "board_size",
+            "win_length",
+            "rating",
+            "rating_band",
+            "date",
+            "game",
+            "status",
+        )
+        read_only_fields = ("player", "rating", "date", "game")
+
+    def validate(self, attrs):
+        attrs = validate_board_settings(attrs)
+        player = UserProfile.objects.filter(user=self.context["request"].user).first()
+        if player is None:
+            raise ValidationError(_("Create your profile first."))
+        attrs["player"] = player
+        return attrs
+
+    def get_status(self, match_request) -> str:
+        return "waiting" if match_request.is_waiting else "matched"
+
+    def create(self, validated_data):
+        player = validated_data["player"]
+        matchmaker = matchmaking.MATCHMAKER
+        matchmaker.load()
+        board_settings = (validated_data["board_size"], validated_data["win_length"])
+        # saved before the player can be found, so its request can be claimed
+        match_request, _created = MatchRequest.objects.update_or_create(
+            player=player,
+            defaults={
+                "board_size": validated_data["board_size"],
+                "win_length": validated_data["win_length"],
+                "rating": player.rating,
+                "rating_band": validated_data["rating_band"],
+                "date": timezone.now(),
+                "game": None,
+            },
+        )
+        ticket = matchmaker.ticket(
+            player.id, player.rating, validated_data["rating_band"]
+        )
+        # opponents matched meanwhile by another process are skipped
+        while match_request.is_waiting:
+            opponent = matchmaker.match(board_settings, ticket)
+            if opponent is None:
+                break
+            game = self.start_game(opponent.player_id, match_request)
+            if game is not None:
+                match_request.game = game
+        return match_request
+
+    def start_game(
+        self, opponent_id: int, match_request: MatchRequest
+    ) -> Optional[Game]:
+        """
+        Create the game through `GamePlaySerializer` and claim the request
+        of the opponent, who moves first. None if it's no longer waiting.
+        """
+        serializer = GamePlaySerializer(
+            data={
+                "players": [opponent_id, match_request.player_id],
+                "board_size": match_request.board_size,
+                "win_length": match_request.win_length,
+            }
+        )
+        if not serializer.is_valid():
+            # e.g. the opponent was deactivated meanwhile
+            return None
+        with transaction.atomic():
+            game = serializer.save()
+            claimed = MatchRequest.objects.filter(
+                player_id=opponent_id, game__isnull=True
+            ).update(game=game)
+            if not claimed:
+                transaction.set_rollback(True)
+                return None
+            MatchRequest.objects.filter(player_id=match_request.player_id).update(
+                game=game
+            )
+        return game
+
+
+class RequestProfileSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RequestProfile
+        fields = (
+            "id",
+            "date",
+            "user",
+            "method",
+            "path",
+            "status",
+            "duration",
+            "queries",
+            "sections",
+        )
+
+
+class RequestProfileDetailSerializer(RequestProfileSerializer):
+    """Profile with the report of functions taking the most time."""
+
+    top = serializers.SerializerMethodField()
 
-        moves_list = list(self.instance.game_status.values())
-        played_moves = [obj for list in moves_list for obj in list]
-        all_moves = [k for k in range(self.instance.board_size**2)]
-        no_played_moves = all(item in played_moves for item in all_moves)
+    class Meta(RequestProfileSerializer.Meta):
+        fields = RequestProfileSerializer.Meta.fields + ("top",)
 
-        return no_winner and no_played_moves
+    def get_top(self, request_profile) -> List[str]:
+        return profiling.top_functions(request_profile.stats)
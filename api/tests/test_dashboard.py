@@ -0,0 +1,67 @@
+import time
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from rest_framework.reverse import reverse
+from rest_framework.status import HTTP_200_OK
+
+from model_bakery import baker
+
+from api.models import HighScore, User, UserProfile
+
+
+@pytest.mark.django_db
+def test_dashboard_cached_until_new_highscore(
+    client, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    cache.clear()
+    response = client.post(
+        reverse("rest_register"),
+        data=dict(
+            username="first_user",
+            email="first_user@gmail.com",
+            password1="first_password",
+            password2="first_password",
+        ),
+    )
+    parsed_response = response.json()
+    first_user = User.objects.get(id=parsed_response["user"]["pk"])
+    player = baker.make(UserProfile, user=first_user)
+    with django_capture_on_commit_callbacks(execute=True):
+        for moves_count in [5, 3, 4]:
+            HighScore.objects.create(
+                player=player, moves_count=moves_count, duration_time=timedelta(1)
+            )
+
+    response = client.get(reverse("dashboard"))
+    assert response.status_code == HTTP_200_OK
+    assert [score["moves_count"] for score in response.json()] == [3, 4, 5]
+
+    # only session and user are queried
+    with django_assert_num_queries(2):
+        response = client.get(reverse("dashboard"))
+    assert [score["moves_count"] for score in response.json()] == [3, 4, 5]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        HighScore.objects.create(
+            player=player, moves_count=3, duration_time=timedelta(0)
+        )
+    response = client.get(reverse("dashboard"))
+    assert [score["moves_count"] for score in response.json()] == [3, 3, 4, 5]
+
+
+@pytest.mark.django_db
+def test_dashboard_cache_expires(client, settings, django_capture_on_commit_callbacks):
+    cache.clear()
+    settings.LEADERBOARD_CACHE_TIMEOUT = 0.5
+    client.force_login(baker.make(User))
+    player = baker.make(UserProfile)
+    assert client.get(reverse("dashboard")).json() == []
+
+    # saved by another process, invalidation of its own cache isn't seen here
+    with django_capture_on_commit_callbacks(execute=False):
+        HighScore.objects.create(player=player, moves_count=3, duration_time=timedelta(0))
+    assert client.get(reverse("dashboard")).json() == []
+    time.sleep(0.6)
+    assert len(client.get(reverse("dashboard")).json()) == 1
@@ -0,0 +1,208 @@
+import time
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from api.engine import Board, winning_lines
+from api.engine import analysis, mcts, pool, simulation, tablebase
+from api.engine.search import best_move
+
+
+def test_winning_lines_numbered_vertically():
+    assert winning_lines(3) == (
+        (0, 3, 6),
+        (1, 4, 7),
+        (2, 5, 8),
+        (0, 1, 2),
+        (3, 4, 5),
+        (6, 7, 8),
+        (0, 4, 8),
+        (6, 4, 2),
+    )
+
+
+def test_board_winning_line():
+    board = Board.from_moves(3, [[0, 4], [1, 2]])
+    assert board.winning_line(0) is None
+
+    board.play(0, 8)
+    assert board.winning_line(0) == [0, 4, 8]
+    assert board.winning_line(1) is None
+
+
+def test_board_legal_moves_and_full_board():
+    board = Board.from_moves(3, [[0, 4, 5, 6], [1, 2, 3, 7]])
+    assert not board.is_legal(0)
+    assert not board.is_legal(9)
+    assert board.is_legal(8)
+    assert not board.is_full()
+
+    board.play(0, 8)
+    assert board.is_full()
+
+
+def test_winning_line_through_last_move():
+    board = Board.from_moves(3, [[0, 4, 8], []])
+    assert board.winning_line(0, 8) == [0, 4, 8]
+    assert board.winning_line(0, 4) == [0, 4, 8]
+
+    board = Board.from_moves(3, [[6, 4, 2], []])
+    assert board.winning_line(0, 4) == [6, 4, 2]
+
+
+def test_winning_lines_of_given_length():
+    lines = winning_lines(4, 3)
+    assert len(lines) == 4 * 2 * 2 + 2 * 2 * 2
+    assert (0, 4, 8) in lines
+    assert (5, 10, 15) in lines
+    assert (12, 9, 6) in lines
+
+
+def test_k_in_a_row_on_large_board():
+    size = 100
+    # off the main diagonals: from (row 10, col 20) towards the bottom left
+    cells = [(20 - i) * size + 10 + i for i in range(5)]
+    board = Board.from_moves(size, [cells[:3], []], win_length=5)
+    board.play(0, cells[4])
+    assert board.winning_line(0, cells[4]) is None
+
+    board.play(0, cells[3])
+    assert board.winning_line(0, cells[3]) == cells
+    assert board.winning_line(0) == cells
+
+
+def test_run_does_not_wrap_to_next_column():
+    board = Board.from_moves(100, [[99, 100], []], win_length=2)
+    assert board.winning_line(0, 100) is None
+
+
+def test_winning_lines_table_is_shared():
+    assert winning_lines(5) is winning_lines(5, 5)
+    assert winning_lines(5, 4) is winning_lines(5, 4)
+
+
+def test_board_packed_into_fixed_width_bytes():
+    board = Board.from_moves(3, [[0, 8], [4]])
+    data = board.to_bytes()
+    assert data == b"\x01\x01\x10\x00"
+
+    board = Board.from_bytes(3, data)
+    assert board.cells_of(0) == [0, 8]
+    assert board.cells_of(1) == [4]
+    assert board.moves_count(0) == 2
+    assert Board.from_bytes(3, b"").masks == [0, 0]
+
+
+def test_best_move_plays_perfectly_on_small_board():
+    # takes the win rather than blocking
+    board = Board.from_moves(3, [[0, 1], [3, 4]])
+    assert best_move(board, 0) == 2
+    # blocks the opponent's row
+    board = Board.from_moves(3, [[0, 8], [3, 4]])
+    assert best_move(board, 0) == 5
+    # perfect players always draw
+    board = Board(3)
+    for ply in range(9):
+        player = ply % 2
+        cell = best_move(board, player)
+        board.play(player, cell)
+        assert board.winning_line(player, cell) is None
+    assert board.is_full()
+
+
+def test_best_move_on_large_board_within_time_budget():
+    # four in a row open at both ends must be blocked
+    board = Board.from_moves(15, [[0, 200], [33, 48, 63, 78]], win_length=5)
+    assert best_move(board, 0, time_budget=0.05) in (18, 93)
+    # and completed when it's our own
+    board = Board.from_moves(15, [[33, 48, 63, 78], [0, 200, 201]], win_length=5)
+    assert best_move(board, 0, time_budget=0.05) in (18, 93)
+
+
+def test_tablebase_lookup(tmp_path):
+    path = str(tmp_path / "tablebase.bin")
+    assert tablebase.load_tablebase(path) is None
+    tablebase.write(path)
+    assert tablebase.load_tablebase(path) is not None
+    table = tablebase.Tablebase(path)
+
+    assert table.lookup(Board(3), 0) == (0, "draw")
+    # positions are seen from the side to move, whichever slot it is
+    board = Board.from_moves(3, [[3, 4], [0, 1]])
+    assert table.lookup(board, 1) == (2, "win")
+    assert table.lookup(board, 0) == (5, "win")
+    board = Board.from_moves(3, [[0], [4, 1]])
+    assert table.lookup(board, 0) == (7, "draw")
+    # the game is over
+    assert table.lookup(Board.from_moves(3, [[0, 1, 2], [3, 4]]), 1) == (None, "loss")
+    # both sides have a line, never reached
+    assert table.lookup(Board.from_moves(3, [[0, 1, 2], [3, 4, 5]]), 0) == (None, None)
+    assert not table.covers(Board(4))
+
+
+def test_mcts_finds_forced_moves():
+    # completes its own four rather than blocking
+    board = Board.from_moves(15, [[33, 48, 63, 78], [0, 200, 201]], win_length=5)
+    assert mcts.best_move(board, 0, simulations=500, workers=1) in (18, 93)
+
+
+def test_mcts_root_parallel_statistics_are_merged():
+    board = Board.from_moves(11, [[60], [61]], win_length=5)
+    stats = mcts.parallel_search(board, 0, simulations=200, workers=2)
+    assert sum(visits for visits, _wins in stats.values()) == 200
+    assert set(stats) <= set(range(121)) - {60, 61}
+
+
+def test_mcts_time_budget():
+    board = Board.from_moves(100, [[5050], [5051]], win_length=5)
+    start = time.monotonic()
+    stats = mcts.search(100, 5, board.masks[:2], 0, 10**6, seed=1, time_budget=0.2)
+    assert time.monotonic() - start < 2
+    assert 0 < sum(visits for visits, _wins in stats.values()) < 10**6
+
+
+def test_analysis_judges_moves_and_finds_decisive_ply():
+    history = [(0, 0), (1, 3), (0, 4), (1, 8), (0, 1), (1, 2), (0, 7)]
+    [result] = analysis.analyse_games([(3, 3)], [history], workers=1)
+    moves = result["moves"]
+    assert [move["judgement"] for move in moves] == [
+        None, "blunder", None, None, None, None, None
+    ]
+    # only the center keeps the draw after the corner opening
+    assert moves[1]["best_move"] == 4
+    assert moves[1]["best_outcome"] == "draw"
+    assert moves[-1]["outcome"] == "win"
+    assert result["decided_at"] == 1
+    # moves of many games are evaluated together, in worker processes too
+    assert analysis.analyse_games([(3, 3)] * 2, [history] * 2, workers=2) == [result] * 2
+
+
+def test_simulation_totals():
+    totals = simulation.simulate(3, 3, games=200, seed=1)
+    assert totals["games"] == 200
+    assert totals["first_wins"] + totals["second_wins"] + totals["draws"] == 200
+    assert 5 * 200 <= totals["moves"] <= 9 * 200
+    # the engine never loses against random moves
+    totals = simulation.simulate(3, 3, games=20, strategy=simulation.MIXED, seed=1)
+    assert totals["first_wins"] == 0
+
+
+def test_simulate_command():
+    output = StringIO()
+    call_command("simulate", sizes=[3], games=10, workers=1, stdout=output)
+    assert output.getvalue().splitlines()[1].split()[:3] == ["3", "3", "10"]
+    with pytest.raises(CommandError):
+        call_command("simulate", games=0, stdout=output)
+    with pytest.raises(CommandError):
+        call_command("simulate", workers=0, stdout=output)
+    with pytest.raises(CommandError):
+        call_command("simulate", sizes=[3, 0], stdout=output)
+
+
+def test_pool_map_shares_one_pool():
+    jobs = [(base, exponent) for base in range(2, 7) for exponent in range(3)]
+    assert pool.pool_map(pow, jobs, workers=3) == [pow(*job) for job in jobs]
+    executor = pool.get_executor()
+    assert pool.pool_map(pow, jobs[:2], workers=2) == [1, 2]
+    assert pool.get_executor() is executor
@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import pytest
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.test import AsyncClient
+from rest_framework.reverse import reverse
+from rest_framework.status import (
+    HTTP_200_OK,
+    HTTP_204_NO_CONTENT,
+    HTTP_401_UNAUTHORIZED,
+)
+from rest_framework_simplejwt.tokens import AccessToken
+
+from model_bakery import baker
+
+from api.models import Game, User, UserProfile
+from api.websockets import CLOSE_UNAUTHORIZED, game_updates
+
+
+def websocket_scope(game, cookie=""):
+    return {
+        "type": "websocket",
+        "path": "/ws/play/{}/".format(game.id),
+        "headers": [(b"cookie", cookie.encode())],
+    }
+
+
+@pytest.mark.django_db(transaction=True)
+def test_game_updates_pushed_to_websocket(client):
+    client.force_login(baker.make(User))
+    cookie = "{}={}".format(
+        settings.SESSION_COOKIE_NAME, client.cookies[settings.SESSION_COOKIE_NAME].value
+    )
+    first_player, second_player = baker.make(UserProfile, _quantity=2)
+    game = baker.make(
+        Game, players=[first_player, second_player], current_player=first_player
+    )
+    url = reverse("gameplay-moves", kwargs={"pk": game.id})
+
+    async def play():
+        received, sent = asyncio.Queue(), asyncio.Queue()
+        connection = asyncio.ensure_future(
+            game_updates(websocket_scope(game, cookie), received.get, sent.put)
+        )
+        await received.put({"type": "websocket.connect"})
+        assert (await sent.get())["type"] == "websocket.accept"
+        state = json.loads((await sent.get())["text"])
+        assert state["type"] == "state"
+        assert state["version"] == 0
+
+        await sync_to_async(client.post)(
+            url, data={"moves": [0, 1, 4, 2, 8]}, content_type="application/json"
+        )
+        move = json.loads((await sent.get())["text"])
+        winner = json.loads((await sent.get())["text"])
+
+        await received.put({"type": "websocket.disconnect"})
+        await connection
+        return move, winner
+
+    move, winner = asyncio.run(play())
+    assert move["type"] == "move"
+    assert move["version"] == 1
+    assert move["game_status"][str(first_player.id)] == [0, 4, 8]
+    assert winner == {
+        "type": "winner",
+        "game": game.id,
+        "winner": first_player.id,
+        "winner_combination": [0, 4, 8],
+    }
+
+
+@pytest.mark.django_db(transaction=True)
+def test_game_updates_require_authentication():
+    game = baker.make(Game)
+    deleted_user = baker.make(User)
+    token = AccessToken.for_user(deleted_user)
+    deleted_user.delete()
+
+    async def connect(cookie):
+        received, sent = asyncio.Queue(), asyncio.Queue()
+        await received.put({"type": "websocket.connect"})
+        await game_updates(websocket_scope(game, cookie), received.get, sent.put)
+        return await sent.get()
+
+    for cookie in ["", "{}={}".format(settings.JWT_AUTH_COOKIE, token)]:
+        assert asyncio.run(connect(cookie)) == {
+            "type": "websocket.close",
+            "code": CLOSE_UNAUTHORIZED,
+        }
+
+
+@pytest.mark.django_db(transaction=True)
+def test_wait_for_move(client):
+    user = baker.make(User)
+    client.force_login(user)
+    async_client = AsyncClient()
+    async_client.force_login(user)
+    first_player, second_player = baker.make(UserProfile, _quantity=2)
+    game = baker.make(
+        Game, players=[first_player, second_player], current_player=first_player
+    )
+    url = reverse("gameplay-wait", kwargs={"pk": game.id})
+
+    async def wait_and_play():
+        waiting = asyncio.ensure_future(async_client.get(url, {"after_version": 0}))
+        await asyncio.sleep(0.1)
+        assert not waiting.done()
+        await sync_to_async(client.patch)(
+            reverse("gameplay-detail", kwargs={"pk": game.id}),
+            data={"move": 4},
+            content_type="application/json",
+        )
+        return await asyncio.wait_for(waiting, 5)
+
+    response = asyncio.run(wait_and_play())
+    assert response.status_code == HTTP_200_OK
+    assert response.json()["version"] == 1
+    assert response.json()["game_status"][str(first_player.id)] == [4]
+
+    # already newer version is returned at once
+    response = asyncio.run(async_client.get(url, {"after_version": 0}))
+    assert response.json()["version"] == 1
+
+    response = asyncio.run(async_client.get(url, {"after_version": 1, "timeout": 0.1}))
+    assert response.status_code == HTTP_204_NO_CONTENT
+
+    response = asyncio.run(AsyncClient().get(url))
+    assert response.status_code == HTTP_401_UNAUTHORIZED
+
+    expired = AsyncClient()
+    expired.cookies[settings.JWT_AUTH_COOKIE] = "expired.or.invalid"
+    response = asyncio.run(expired.get(url))
+    assert response.status_code == HTTP_401_UNAUTHORIZED
@@ -0,0 +1,102 @@
+import pytest
+from model_bakery import baker
+from rest_framework.reverse import reverse
+from rest_framework.status import (
+    HTTP_201_CREATED,
+    HTTP_204_NO_CONTENT,
+    HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
+)
+
+from api import matchmaking
+from api.models import Game, MatchRequest, User, UserProfile
+
+
+@pytest.fixture
+def matchmaker(monkeypatch):
+    matchmaker = matchmaking.Matchmaker()
+    monkeypatch.setattr(matchmaking, "MATCHMAKER", matchmaker)
+    return matchmaker
+
+
+def test_matchmaker_buckets(settings):
+    settings.MATCHMAKING_BUCKET_WIDTH = 50
+    matchmaker = matchmaking.Matchmaker()
+    three = (3, 3)
+
+    def enqueue(player_id, rating, band, board_settings=three):
+        ticket = matchmaker.ticket(player_id, rating, band)
+        opponent = matchmaker.match(board_settings, ticket)
+        return opponent and opponent.player_id
+
+    assert enqueue(1, 1200, 100) is None
+    # other board settings and ratings out of the band wait apart
+    assert enqueue(2, 1200, 800, (4, 4)) is None
+    assert enqueue(3, 1500, 800) is None
+    # the narrower band of both applies
+    assert enqueue(4, 1350, 100) is None
+    assert len(matchmaker) == 4
+    # the longest waiting within reach is taken
+    assert enqueue(5, 1250, 800) == 1
+    assert enqueue(6, 1400, 200) == 3
+    assert enqueue(7, 1350, 50) == 4
+    assert len(matchmaker) == 1
+    # enqueued again with other settings
+    assert enqueue(2, 1200, 800) is None
+    assert len(matchmaker) == 1
+    assert matchmaker.remove(2).rating == 1200
+    assert not matchmaker.queues[three] and not matchmaker.queues[(4, 4)]
+
+
+def login(client, rating=1200):
+    user = baker.make(User)
+    client.force_login(user)
+    return baker.make(UserProfile, user=user, rating=rating)
+
+
+@pytest.mark.django_db
+def test_matchmaking(client, matchmaker):
+    url = reverse("matchmaking")
+    first_player = login(client, rating=1250)
+    response = client.post(url, data={"board_size": 4, "rating_band": 100})
+    assert response.status_code == HTTP_201_CREATED
+    assert response.json()["status"] == "waiting"
+    assert response.json()["win_length"] == 4
+    assert client.get(url).json()["status"] == "waiting"
+
+    second_player = login(client, rating=1150)
+    response = client.post(url, data={"board_size": 4})
+    assert response.status_code == HTTP_201_CREATED
+    assert response.json()["status"] == "matched"
+    game = Game.objects.get(id=response.json()["game"])
+    assert game.player_ids == sorted([first_player.id, second_player.id])
+    assert (game.board_size, game.win_length) == (4, 4)
+    assert game.current_player_id == first_player.id
+
+    client.force_login(first_player.user)
+    assert client.get(url).json()["game"] == game.id
+    assert client.delete(url).status_code == HTTP_204_NO_CONTENT
+    assert client.get(url).status_code == HTTP_404_NOT_FOUND
+    assert len(matchmaker) == 0
+
+
+@pytest.mark.django_db
+def test_matchmaking_after_restart(client, matchmaker):
+    url = reverse("matchmaking")
+    # request cancelled meanwhile through another process
+    gone = baker.make(UserProfile, rating=1200)
+    matchmaker.match((3, 3), matchmaker.ticket(gone.id, 1200, 200))
+    waiting = baker.make(UserProfile, rating=1200)
+    MatchRequest.objects.create(player=waiting, rating=1200, rating_band=200)
+
+    login(client)
+    response = client.post(url, data={"rating_band": 200})
+    game = Game.objects.get(id=response.json()["game"])
+    assert waiting.id in game.player_ids and gone.id not in game.player_ids
+    assert len(matchmaker) == 0
+    assert MatchRequest.objects.get(player=waiting).game == game
+
+    # only players with a profile can be matched
+    client.force_login(baker.make(User))
+    response = client.post(url, data={"rating_band": 200})
+    assert response.status_code == HTTP_400_BAD_REQUEST
@@ -0,0 +1,100 @@
+import json
+import os
+
+import pytest
+from model_bakery import baker
+from rest_framework.reverse import reverse
+
+from api import metrics
+from api.models import UserProfile
+
+
+def sample_value(text: str, sample: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(sample + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+@pytest.mark.django_db
+def test_metrics_of_requests_and_games(client, django_capture_on_commit_callbacks):
+    client.post(
+        reverse("rest_register"),
+        data=dict(
+            username="first_user",
+            email="first_user@gmail.com",
+            password1="first_password",
+            password2="first_password",
+        ),
+    )
+    first_player, second_player = baker.make(UserProfile, _quantity=2)
+    before = client.get("/metrics").content.decode()
+
+    # domain events are counted once committed
+    with django_capture_on_commit_callbacks(execute=True):
+        data = {"board_size": 3, "players": [first_player.id, second_player.id]}
+        response = client.post(reverse("gameplay-list"), data=data)
+        url = reverse("gameplay-detail", kwargs={"pk": response.json()["id"]})
+        for move in (0, 3, 1, 4, 2):
+            client.patch(url, data={"move": move}, content_type="application/json")
+
+    response = client.get("/metrics")
+    assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+    after = response.content.decode()
+
+    def increase(sample: str) -> float:
+        return sample_value(after, sample) - sample_value(before, sample)
+
+    labels = '{view="GamePlayViewSet",action="partial_update",method="PATCH"}'
+    assert increase("http_request_duration_seconds_count" + labels) == 5
+    assert increase("http_request_db_queries_count" + labels) == 5
+    # 8 statements per move, plus the highscore of the winning one
+    assert increase("http_request_db_queries_sum" + labels) == 5 * 8 + 1
+    assert increase('games_created_total{board_size="3"}') == 1
+    assert increase('moves_total{board_size="3"}') == 5
+    assert increase('wins_total{board_size="3"}') == 1
+
+
+def test_metrics_of_processes_are_summed(settings, tmp_path):
+    settings.METRICS_DIR = str(tmp_path)
+    metrics.draws.inc(board_size=4)
+    own = metrics.REGISTRY.collect()["draws_total"][("4",)]
+
+    # file left by another worker process
+    with open(os.path.join(str(tmp_path), "metrics-1-1.json"), "w") as file:
+        json.dump(
+            {
+                "draws_total": [[["4"], 2]],
+                "http_request_duration_seconds": [
+                    [["View", "list", "GET"], [1] + [0] * 10 + [0.004, 1]],
+                ],
+            },
+            file,
+        )
+    text = metrics.REGISTRY.render()
+    assert sample_value(text, 'draws_total{board_size="4"}') == own + 2
+    name = 'http_request_duration_seconds_{}{{view="View",action="list",method="GET"{}}}'
+    assert sample_value(text, name.format("bucket", ',le="0.005"')) == 1
+    assert sample_value(text, name.format("bucket", ',le="+Inf"')) == 1
+    assert sample_value(text, name.format("count", "")) == 1
+    assert os.path.exists(metrics.REGISTRY._path(str(tmp_path)))
+
+    # the other process exited long ago
+    other = os.path.join(str(tmp_path), "metrics-1-1.json")
+    os.utime(other, (0, 0))
+    text = metrics.REGISTRY.render()
+    assert sample_value(text, 'draws_total{board_size="4"}') == own
+    assert not os.path.exists(other)
+
+
+def test_metrics_access(client, settings):
+    assert client.get("/metrics", REMOTE_ADDR="10.0.0.1").status_code == 403
+    settings.METRICS_TOKEN = "scraper-token"
+    response = client.get(
+        "/metrics", REMOTE_ADDR="10.0.0.1", HTTP_AUTHORIZATION="Bearer scraper-token"
+    )
+    assert response.status_code == 200
+    response = client.get(
+        "/metrics", REMOTE_ADDR="10.0.0.1", HTTP_AUTHORIZATION="Bearer other"
+    )
+    assert response.status_code == 403
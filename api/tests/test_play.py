@@ -1,13 +1,21 @@
+from io import StringIO
+
 import pytest
+from django.core.management import call_command
+from rest_framework.exceptions import ValidationError
 from rest_framework.reverse import reverse
 from rest_framework.status import (
     HTTP_200_OK,
     HTTP_201_CREATED,
+    HTTP_304_NOT_MODIFIED,
+    HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
 )
 
 from model_bakery import baker
 
-from api.models import Game, User, UserProfile
+from api.models import Game, GameAnalysis, User, UserProfile
+from api.serializers import GamePlayPartialUpdateSerializer, GamePlaySerializer
 
 """
     TODO: tests failed:
@@ -73,7 +81,7 @@ def test_view_play_success(client):
     response = client.get(url)
 
     assert response.status_code == HTTP_200_OK
-    assert response.json()[0]["id"] == game.id
+    assert response.json()["results"][0]["id"] == game.id
 
 
 @pytest.mark.django_db
@@ -202,3 +210,575 @@ def test_update_play_success(client):
 
     assert response.status_code == HTTP_200_OK
     assert parsed_response == new_game.game_status
+
+
+@pytest.mark.django_db
+def test_play_win_length_on_large_board(client):
+    response = client.post(
+        reverse("rest_register"),
+        data=dict(
+            username="first_user",
+            email="first_user@gmail.com",
+            password1="first_password",
+            password2="first_password",
+        ),
+    )
+    parsed_response = response.json()
+    first_user = User.objects.get(id=parsed_response["user"]["pk"])
+    response = client.post(
+        reverse("rest_register"),
+        data=dict(
+            username="second_user",
+            email="second_user@gmail.com",
+            password1="second_password",
+            password2="second_password",
+        ),
+    )
+    parsed_response = response.json()
+    second_user = User.objects.get(id=parsed_response["user"]["pk"])
+    first_player = baker.make(UserProfile, user=first_user)
+    second_player = baker.make(UserProfile, user=second_user)
+    data = {
+        "max_players_number": 2,
+        "board_size": 15,
+        "win_length": 3,
+        "players": [first_player.id, second_player.id],
+    }
+    url = reverse("gameplay-list")
+    response = client.post(url, data=data)
+    new_game = Game.objects.get(id=response.json()["id"])
+    assert new_game.win_length == 3
+
+    url = reverse("gameplay-detail", kwargs={"pk": new_game.id})
+    # first player takes cells 20, 36 and 52 on a diagonal
+    for move in [20, 0, 36, 1, 52]:
+        response = client.patch(url, data={"move": move}, content_type="application/json")
+        assert response.status_code == HTTP_200_OK
+    new_game.refresh_from_db()
+
+    assert new_game.has_winner
+    assert new_game.winner_combination == [20, 36, 52]
+
+
+@pytest.mark.django_db
+def test_view_play_winning_combinations_on_request(client):
+    client.force_login(baker.make(User))
+    players = [player.id for player in baker.make(UserProfile, _quantity=2)]
+    response = client.post(reverse("gameplay-list"), data={"players": players})
+    assert "winning_combinations" not in response.json()
+    url = reverse("gameplay-detail", kwargs={"pk": response.json()["id"]})
+    assert "winning_combinations" not in client.get(url).json()
+    games = client.get(reverse("gameplay-list")).json()["results"]
+    assert "winning_combinations" not in games[0]
+
+    response = client.get(url, {"winning_combinations": "true"})
+    assert len(response.json()["winning_combinations"]) == 8
+
+
+@pytest.mark.django_db
+def test_create_play_board_size_limit(client, settings):
+    client.force_login(baker.make(User))
+    players = [player.id for player in baker.make(UserProfile, _quantity=2)]
+    url = reverse("gameplay-list")
+    for board_size in (0, settings.MAX_BOARD_SIZE + 1):
+        response = client.post(url, data={"board_size": board_size, "players": players})
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert "board_size" in response.json()
+    assert not Game.objects.exists()
+
+
+@pytest.mark.django_db
+def test_view_play_malformed_id(client):
+    client.force_login(baker.make(User))
+    response = client.get(reverse("gameplay-list") + "abc/")
+    assert response.status_code == HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_update_play_keeps_concurrent_move(client):
+    client.force_login(baker.make(User))
+    players = [player.id for player in baker.make(UserProfile, _quantity=2)]
+    response = client.post(reverse("gameplay-list"), data={"players": players})
+    game = Game.objects.get(id=response.json()["id"])
+    url = reverse("gameplay-detail", kwargs={"pk": game.id})
+
+    # the game is read for a PUT, then a move is played meanwhile
+    serializer = GamePlaySerializer(game, data={"players": players, "is_done": True})
+    assert serializer.is_valid()
+    client.patch(url, data={"move": 4}, content_type="application/json")
+    with pytest.raises(ValidationError):
+        serializer.save()
+
+    game.refresh_from_db()
+    assert (game.ply, game.version, game.is_done) == (1, 1, False)
+    assert game.get_board().cells_of(0) == [4]
+
+
+@pytest.mark.django_db
+def test_update_play_null_move(client):
+    client.force_login(baker.make(User))
+    players = [player.id for player in baker.make(UserProfile, _quantity=2)]
+    response = client.post(reverse("gameplay-list"), data={"players": players})
+    url = reverse("gameplay-detail", kwargs={"pk": response.json()["id"]})
+
+    response = client.patch(url, data={"move": None}, content_type="application/json")
+    assert response.status_code == HTTP_400_BAD_REQUEST
+    assert response.json() == {"move": ["Move is not valid."]}
+
+
+@pytest.mark.django_db
+def test_update_play_keeps_board_settings(client):
+    client.force_login(baker.make(User))
+    first_player, second_player = baker.make(UserProfile, _quantity=2)
+    players = [first_player.id, second_player.id]
+    response = client.post(
+        reverse("gameplay-list"), data={"board_size": 3, "players": players}
+    )
+    url = reverse("gameplay-detail", kwargs={"pk": response.json()["id"]})
+    client.patch(url, data={"move": 4}, content_type="application/json")
+
+    response = client.put(
+        url, data={"board_size": 5, "players": players}, content_type="application/json"
+    )
+    assert response.status_code == HTTP_400_BAD_REQUEST
+    assert "board_size" in response.json()
+
+    # omitted settings are left as they are
+    response = client.put(
+        url, data={"players": players}, content_type="application/json"
+    )
+    assert response.status_code == HTTP_200_OK
+    game = Game.objects.get(id=response.json()["id"])
+    assert (game.board_size, game.win_length) == (3, 3)
+    assert client.get(url).json()["game_status"][str(first_player.id)] == [4]
+
+
+@pytest.mark.django_db
+def test_update_play_single_write(client, django_assert_num_queries):
+    response = client.post(
+        reverse("rest_register"),
+        data=dict(
+            username="first_user",
+            email="first_user@gmail.com",
+            password1="first_password",
+            password2="first_password",
+        ),
+    )
+    parsed_response = response.json()
+    first_user = User.objects.get(id=parsed_response["user"]["pk"])
+    response = client.post(
+        reverse("rest_register"),
+        data=dict(
+            username="second_user",
+            email="second_user@gmail.com",
+            password1="second_password",
+            password2="second_password",
+        ),
+    )
+    parsed_response = response.json()
+    second_user = User.objects.get(id=parsed_response["user"]["pk"])
+    first_player = baker.make(UserProfile, user=first_user)
+    second_player = baker.make(UserProfile, user=second_user)
+    data = {
+        "max_players_number": 2,
+        "board_size": 3,
+        "players": [first_player.id, second_player.id],
+    }
+    url = reverse("gameplay-list")
+    response = client.post(url, data=data)
+    new_game = Game.objects.get(id=response.json()["id"])
+
+    url = reverse("gameplay-detail", kwargs={"pk": new_game.id})
+    # session, user, game, players, then INSERT of the move and UPDATE
+    # of the game inside a savepoint
+    with django_assert_num_queries(8):
+        response = client.patch(url, data={"move": 1}, content_type="application/json")
+    assert response.status_code == HTTP_200_OK
+    new_game.refresh_from_db()
+    assert new_game.version == 1
+    assert new_game.ply == 1
+    assert new_game.current_player_id == second_player.id
+    assert list(new_game.moves.values_list("player", "cell", "ply")) == [
+        (first_player.id, 1, 0)
+    ]
+
+    # a move validated against an outdated version is rejected
+    stale_game = Game.objects.get(id=new_game.id)
+    response = client.patch(url, data={"move": 2}, content_type="application/json")
+    assert response.status_code == HTTP_200_OK
+    serializer = GamePlayPartialUpdateSerializer(stale_game, data={"move": 3})
+    assert serializer.is_valid()
+    with pytest.raises(ValidationError):
+        serializer.save()
+    new_game.refresh_from_db()
+    assert new_game.version == 2
+
+
+@pytest.mark.django_db
+def test_view_play_list_filtered(client, django_assert_num_queries):
+    response = client.post(
+        reverse("rest_register"),
+        data=dict(
+            username="first_user",
+            email="first_user@gmail.com",
+            password1="first_password",
+            password2="first_password",
+        ),
+    )
+    first_player, second_player, third_player = baker.make(UserProfile, _quantity=3)
+    active_games = baker.make(
+        Game, players=[first_player, second_player], board_size=4, _quantity=60
+    )
+    baker.make(Game, players=[first_player, second_player], is_done=True)
+    other_game = baker.make(Game, players=[second_player, third_player], board_size=4)
+
+    url = reverse("gameplay-list")
+    # session, user, versions of the page for ETag, games, players
+    with django_assert_num_queries(5):
+        response = client.get(
+            url, {"player": first_player.id, "is_done": "false", "board_size": 4}
+        )
+    assert response.status_code == HTTP_200_OK
+    parsed_response = response.json()
+    assert [game["id"] for game in parsed_response["results"]] == [
+        game.id for game in reversed(active_games[10:])
+    ]
+
+    response = client.get(parsed_response["next"])
+    assert [game["id"] for game in response.json()["results"]] == [
+        game.id for game in reversed(active_games[:10])
+    ]
+
+    response = client.get(url, {"player": third_player.id})
+    assert [game["id"] for game in response.json()["results"]] == [other_game.id]
+
+    response = client.get(url, {"board_size": "big"})
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_create_play_validates_players_at_once(client, django_assert_num_queries):
+    response = client.post(
+        reverse("rest_register"),
+        data=dict(
+            username="first_user",
+            email="first_user@gmail.com",
+            password1="first_password",
+            password2="first_password",
+        ),
+    )
+    first_player, second_player, inactive_player = baker.make(UserProfile, _quantity=3)
+    baker.make(UserProfile, _quantity=20)
+    inactive_player.user.is_active = False
+    inactive_player.user.save()
+    url = reverse("gameplay-list")
+
+    # session, user, players, then game and its players inside a savepoint
+    with django_assert_num_queries(9):
+        response = client.post(
+            url,
+            data={"board_size": 3, "players": [first_player.id, second_player.id]},
+            content_type="application/json",
+        )
+    assert response.status_code == HTTP_201_CREATED
+    assert response.json()["current_player"] == first_player.id
+
+    for players in [
+        [first_player.id, first_player.id],
+        [first_player.id, 0],
+        [first_player.id, inactive_player.id],
+    ]:
+        response = client.post(
+            url, data={"players": players}, content_type="application/json"
+        )
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert "players" in response.json()
+
+
+@pytest.mark.django_db
+def test_bulk_create_play_success(client, django_assert_num_queries):
+    response = client.post(
+        reverse("rest_register"),
+        data=dict(
+            username="first_user",
+            email="first_user@gmail.com",
+            password1="first_password",
+            password2="first_password",
+        ),
+    )
+    players = baker.make(UserProfile, _quantity=4)
+    pairings = [
+        [players[0].id, players[1].id],
+        [players[2].id, players[3].id],
+        [players[1].id, players[2].id],
+    ]
+    url = reverse("gameplay-bulk")
+
+    # session, user, players, then games and their players inside a savepoint
+    with django_assert_num_queries(7):
+        response = client.post(
+            url,
+            data={"pairings": pairings, "board_size": 5, "win_length": 4},
+            content_type="application/json",
+        )
+    assert response.status_code == HTTP_201_CREATED
+    parsed_response = response.json()
+    assert [game["players"] for game in parsed_response] == pairings
+    for game, pairing in zip(parsed_response, pairings):
+        new_game = Game.objects.get(id=game["id"])
+        assert sorted(new_game.players.values_list("id", flat=True)) == pairing
+        assert new_game.current_player_id == pairing[0]
+        assert new_game.board_size == 5
+        assert new_game.win_length == 4
+
+    response = client.post(
+        url,
+        data={"pairings": [[players[0].id, 0]]},
+        content_type="application/json",
+    )
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_play_moves_and_replay(client):
+    response = client.post(
+        reverse("rest_register"),
+        data=dict(
+            username="first_user",
+            email="first_user@gmail.com",
+            password1="first_password",
+            password2="first_password",
+        ),
+    )
+    first_player, second_player = baker.make(UserProfile, _quantity=2)
+    data = {
+        "board_size": 3,
+        "players": [second_player.id, first_player.id],
+    }
+    response = client.post(reverse("gameplay-list"), data=data)
+    new_game = Game.objects.get(id=response.json()["id"])
+
+    url = reverse("gameplay-moves", kwargs={"pk": new_game.id})
+    # 1 is already taken, nothing after it is played
+    response = client.post(
+        url, data={"moves": [0, 1, 4, 1, 2]}, content_type="application/json"
+    )
+    assert response.status_code == HTTP_200_OK
+    parsed_response = response.json()
+    assert parsed_response["stopped_at"] == 3
+    assert parsed_response["current_player"] == first_player.id
+    assert parsed_response["version"] == 1
+
+    # the game ends on 8
+    response = client.post(
+        url, data={"moves": [2, 8, 5]}, content_type="application/json"
+    )
+    parsed_response = response.json()
+    assert parsed_response["stopped_at"] == 2
+    assert parsed_response["has_winner"]
+    assert parsed_response["winner_combination"] == [0, 4, 8]
+    assert parsed_response["game_status"] == {
+        str(first_player.id): [1, 2],
+        str(second_player.id): [0, 4, 8],
+    }
+    assert list(new_game.moves.order_by("ply").values_list("cell", flat=True)) == [
+        0, 1, 4, 2, 8
+    ]
+
+    response = client.post(url, data={"moves": [5]}, content_type="application/json")
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+    url = reverse("gameplay-replay", kwargs={"pk": new_game.id})
+    response = client.post(url, content_type="application/json")
+    assert response.status_code == HTTP_201_CREATED
+    parsed_response = response.json()
+    replayed_game = Game.objects.get(id=parsed_response["id"])
+    assert replayed_game.id != new_game.id
+    assert parsed_response["stopped_at"] == 5
+    assert replayed_game.has_winner
+    assert replayed_game.winner_combination == [0, 4, 8]
+    assert replayed_game.moves.get(ply=0).player_id == second_player.id
+
+
+@pytest.mark.django_db
+def test_view_play_not_modified(client, django_assert_num_queries):
+    response = client.post(
+        reverse("rest_register"),
+        data=dict(
+            username="first_user",
+            email="first_user@gmail.com",
+            password1="first_password",
+            password2="first_password",
+        ),
+    )
+    first_player, second_player = baker.make(UserProfile, _quantity=2)
+    game = baker.make(
+        Game, players=[first_player, second_player], current_player=first_player
+    )
+    detail_url = reverse("gameplay-detail", kwargs={"pk": game.id})
+    list_url = reverse("gameplay-list")
+
+    detail_response = client.get(detail_url)
+    list_response = client.get(list_url)
+    assert detail_response.status_code == HTTP_200_OK
+    assert list_response.status_code == HTTP_200_OK
+
+    # session, user and versions only
+    for url, response in [(detail_url, detail_response), (list_url, list_response)]:
+        with django_assert_num_queries(3):
+            not_modified = client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        assert not_modified.status_code == HTTP_304_NOT_MODIFIED
+        assert not_modified["ETag"] == response["ETag"]
+
+    client.patch(detail_url, data={"move": 4}, content_type="application/json")
+    for url, response in [(detail_url, detail_response), (list_url, list_response)]:
+        modified = client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        assert modified.status_code == HTTP_200_OK
+        assert modified["ETag"] != response["ETag"]
+
+
+@pytest.mark.django_db
+def test_play_against_ai(client):
+    response = client.post(
+        reverse("rest_register"),
+        data=dict(
+            username="first_user",
+            email="first_user@gmail.com",
+            password1="first_password",
+            password2="first_password",
+        ),
+    )
+    player = baker.make(UserProfile)
+    response = client.post(
+        reverse("gameplay-list"),
+        data={"board_size": 3, "players": [player.id], "ai": True},
+        content_type="application/json",
+    )
+    assert response.status_code == HTTP_201_CREATED
+    ai_player = UserProfile.objects.get(is_ai=True)
+    new_game = Game.objects.get(id=response.json()["id"])
+    assert new_game.player_ids == sorted([player.id, ai_player.id])
+    assert new_game.current_player_id == player.id
+
+    url = reverse("gameplay-detail", kwargs={"pk": new_game.id})
+    # the computer answers in the same request and takes the center
+    response = client.patch(url, data={"move": 0}, content_type="application/json")
+    assert response.status_code == HTTP_200_OK
+    assert response.json() == {str(player.id): [0], str(ai_player.id): [4]}
+    new_game.refresh_from_db()
+    assert new_game.current_player_id == player.id
+    assert new_game.ply == 2
+    assert new_game.version == 1
+
+    # the computer never loses, the human can't score a highscore
+    for _turn in range(3):
+        if new_game.is_done:
+            break
+        board = new_game.get_board()
+        cell = next(cell for cell in range(9) if board.is_legal(cell))
+        client.patch(url, data={"move": cell}, content_type="application/json")
+        new_game.refresh_from_db()
+    assert new_game.is_done
+    assert not new_game.has_winner or new_game.current_player_id == ai_player.id
+    assert not player.highscores.exists()
+
+
+@pytest.mark.django_db
+def test_play_hint(client, settings, tmp_path):
+    settings.TABLEBASE_PATH = tmp_path / "tablebase.bin"
+    call_command("build_tablebase", stdout=StringIO())
+    response = client.post(
+        reverse("rest_register"),
+        data=dict(
+            username="first_user",
+            email="first_user@gmail.com",
+            password1="first_password",
+            password2="first_password",
+        ),
+    )
+    first_player, second_player = baker.make(UserProfile, _quantity=2)
+    data = {"board_size": 3, "players": [first_player.id, second_player.id]}
+    response = client.post(reverse("gameplay-list"), data=data)
+    game_id = response.json()["id"]
+
+    url = reverse("gameplay-moves", kwargs={"pk": game_id})
+    client.post(url, data={"moves": [0, 4, 1]}, content_type="application/json")
+    response = client.get(reverse("gameplay-hint", kwargs={"pk": game_id}))
+    assert response.status_code == HTTP_200_OK
+    assert response.json() == {"move": 2, "outcome": "draw"}
+
+    client.post(url, data={"moves": [8, 2]}, content_type="application/json")
+    response = client.get(reverse("gameplay-hint", kwargs={"pk": game_id}))
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_play_analysis(client, django_assert_num_queries):
+    response = client.post(
+        reverse("rest_register"),
+        data=dict(
+            username="first_user",
+            email="first_user@gmail.com",
+            password1="first_password",
+            password2="first_password",
+        ),
+    )
+    first_player, second_player = baker.make(UserProfile, _quantity=2)
+    data = {"board_size": 3, "players": [first_player.id, second_player.id]}
+    response = client.post(reverse("gameplay-list"), data=data)
+    game_id = response.json()["id"]
+    url = reverse("gameplay-analysis", kwargs={"pk": game_id})
+
+    client.post(
+        reverse("gameplay-moves", kwargs={"pk": game_id}),
+        data={"moves": [0, 3, 4, 8]},
+        content_type="application/json",
+    )
+    response = client.get(url)
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+    client.post(
+        reverse("gameplay-moves", kwargs={"pk": game_id}),
+        data={"moves": [1, 2, 7]},
+        content_type="application/json",
+    )
+    response = client.get(url)
+    assert response.status_code == HTTP_200_OK
+    parsed_response = response.json()
+    assert parsed_response["decided_at"] == 1
+    assert parsed_response["moves"][1]["player"] == second_player.id
+    assert parsed_response["moves"][1]["judgement"] == "blunder"
+    assert parsed_response["moves"][1]["best_move"] == 4
+
+    # analysed once, then read along with the game
+    with django_assert_num_queries(3):
+        assert client.get(url).json() == parsed_response
+
+    GameAnalysis.objects.all().delete()
+    call_command("analyse_games", workers=1, stdout=StringIO())
+    assert GameAnalysis.objects.get(game_id=game_id).moves == parsed_response["moves"]
+
+
+@pytest.mark.django_db
+def test_play_analysis_without_moves(client):
+    client.post(
+        reverse("rest_register"),
+        data=dict(
+            username="first_user",
+            email="first_user@gmail.com",
+            password1="first_password",
+            password2="first_password",
+        ),
+    )
+    # played before moves were recorded
+    game = baker.make(Game, board_size=3, win_length=3, is_done=True, ply=5)
+    game.players.set(baker.make(UserProfile, _quantity=2))
+
+    response = client.get(reverse("gameplay-analysis", kwargs={"pk": game.id}))
+    assert response.status_code == HTTP_400_BAD_REQUEST
+    assert not GameAnalysis.objects.exists()
+
+    stdout = StringIO()
+    call_command("analyse_games", workers=1, stdout=stdout)
+    assert "1 games skipped" in stdout.getvalue()
+    assert not GameAnalysis.objects.exists()
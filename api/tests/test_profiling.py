@@ -0,0 +1,108 @@
+import marshal
+
+import pytest
+from django.test import Client
+from model_bakery import baker
+from rest_framework.reverse import reverse
+from rest_framework.status import (
+    HTTP_200_OK,
+    HTTP_401_UNAUTHORIZED,
+    HTTP_403_FORBIDDEN,
+)
+
+from api.models import RequestProfile, User, UserProfile
+
+
+def play(client, **extra):
+    first_player, second_player = baker.make(UserProfile, _quantity=2)
+    data = {"board_size": 3, "players": [first_player.id, second_player.id]}
+    response = client.post(reverse("gameplay-list"), data=data)
+    url = reverse("gameplay-detail", kwargs={"pk": response.json()["id"]})
+    return client.patch(
+        url, data={"move": 4}, content_type="application/json", **extra
+    )
+
+
+@pytest.mark.django_db
+def test_profile_requested_by_staff(client):
+    client.force_login(baker.make(User, is_staff=True))
+    response = play(client, HTTP_X_PROFILE="1")
+    assert response.status_code == HTTP_200_OK
+
+    request_profile = RequestProfile.objects.get(id=response["X-Profile-Id"])
+    assert request_profile.method == "PATCH"
+    assert request_profile.status == HTTP_200_OK
+    assert request_profile.queries > 0
+    assert set(request_profile.sections) == {"validate_move", "process_move", "orm"}
+    assert request_profile.sections["process_move"] > 0
+    # other requests aren't profiled
+    assert RequestProfile.objects.count() == 1
+
+    url = reverse("profile-detail", kwargs={"pk": request_profile.id})
+    response = client.get(url)
+    assert response.status_code == HTTP_200_OK
+    assert response.json()["sections"] == request_profile.sections
+    assert "function calls" in response.json()["top"][0]
+
+    response = client.get(reverse("profile-list"))
+    assert [result["id"] for result in response.json()["results"]] == [
+        request_profile.id
+    ]
+
+    response = client.get(
+        reverse("profile-download", kwargs={"pk": request_profile.id})
+    )
+    filename = "profile-{}.prof".format(request_profile.id)
+    assert response["Content-Disposition"] == 'attachment; filename="{}"'.format(filename)
+    assert marshal.loads(response.content)
+
+
+@pytest.mark.django_db
+def test_profile_ignored_for_users(client):
+    client.force_login(baker.make(User))
+    response = play(client, HTTP_X_PROFILE="1")
+    assert response.status_code == HTTP_200_OK
+    assert "X-Profile-Id" not in response
+    assert not RequestProfile.objects.exists()
+
+    response = client.get(reverse("profile-list"))
+    assert response.status_code == HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+def test_profile_requested_with_failing_authentication(client):
+    staff = baker.make(User, is_staff=True)
+    client.force_login(staff)
+    players = [player.id for player in baker.make(UserProfile, _quantity=2)]
+    response = client.post(reverse("gameplay-list"), data={"players": players})
+    url = reverse("gameplay-detail", kwargs={"pk": response.json()["id"]})
+    data = {"move": 0}
+
+    # invalid token
+    response = Client().patch(
+        url,
+        data=data,
+        content_type="application/json",
+        HTTP_AUTHORIZATION="Bearer invalid",
+        HTTP_X_PROFILE="1",
+    )
+    assert response.status_code == HTTP_401_UNAUTHORIZED
+
+    # session without CSRF token
+    csrf_client = Client(enforce_csrf_checks=True)
+    csrf_client.force_login(staff)
+    response = csrf_client.patch(
+        url, data=data, content_type="application/json", HTTP_X_PROFILE="1"
+    )
+    assert response.status_code == HTTP_403_FORBIDDEN
+    assert "CSRF" in response.json()["detail"]
+    assert not RequestProfile.objects.exists()
+
+
+@pytest.mark.django_db
+def test_profile_sampled(client, settings):
+    settings.PROFILING_SAMPLE_RATE = 1.0
+    client.force_login(baker.make(User))
+    response = play(client)
+    request_profile = RequestProfile.objects.get(id=response["X-Profile-Id"])
+    assert request_profile.user is not None
@@ -1,16 +1,25 @@
 from django.conf.urls import include
 from rest_framework import routers
-from api.views import GamePlayViewSet
+from api.views import GamePlayViewSet, RequestProfileViewSet
 from django.urls import re_path
 from . import views
 
 router = routers.DefaultRouter()
 router.register(r"play", GamePlayViewSet, basename="gameplay")
+router.register(r"profiles", RequestProfileViewSet, basename="profile")
 
 urlpatterns = [
+    re_path(r"^play/(?P<pk>\d+)/wait/?$", views.wait_for_move, name="gameplay-wait"),
     re_path(r"^", include(router.urls)),
     re_path(r"^dj-rest-auth/", include("dj_rest_auth.urls")),
     re_path(r"^dj-rest-auth/registration/", include("dj_rest_auth.registration.urls")),
+    re_path(
+        r"^matchmaking/?$",
+        views.MatchmakingViewSet.as_view(
+            {"get": "retrieve", "post": "create", "delete": "destroy"}
+        ),
+        name="matchmaking",
+    ),
     re_path(
         r"^dashboard", views.DashboardViewSet.as_view({"get": "list"}), name="dashboard"
     ),
@@ -1,20 +1,54 @@
+import asyncio
 
-from rest_framework import viewsets
-from rest_framework.permissions import IsAuthenticated
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from rest_framework import mixins, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
 from rest_framework.status import (
     HTTP_200_OK,
+    HTTP_201_CREATED,
+    HTTP_204_NO_CONTENT,
+    HTTP_400_BAD_REQUEST,
+    HTTP_401_UNAUTHORIZED,
+    HTTP_404_NOT_FOUND,
 )
 
-from api.mixins import SerializerActionClassMixin
-from api.models import Game, HighScore
+from api import matchmaking
+from api.authentication import requesting_user
+from api.events import get_backend, load_game_state
+from api.mixins import SerializerActionClassMixin, VersionETagMixin
+from api.models import (
+    LEADERBOARD_CACHE_KEY,
+    Game,
+    GameAnalysis,
+    HighScore,
+    MatchRequest,
+    RequestProfile,
+)
+from api.pagination import GameCursorPagination, RequestProfileCursorPagination
 from api.serializers import (
     DashboardSerializer,
+    GameAnalysisSerializer,
+    GameBulkCreateSerializer,
+    GameFilterSerializer,
+    GameHintSerializer,
+    GamePlayMovesSerializer,
     GamePlayPartialUpdateSerializer,
     GamePlaySerializer,
+    GameReplaySerializer,
+    MatchRequestSerializer,
+    RequestProfileDetailSerializer,
+    RequestProfileSerializer,
 )
 
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from gettext import gettext as _
 
 
 class DashboardViewSet(viewsets.ReadOnlyModelViewSet):
@@ -25,9 +59,24 @@ class DashboardViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = DashboardSerializer
     queryset = HighScore.objects.all().order_by("moves_count", "duration_time")[:10]
 
+    def list(self, request, *args, **kwargs):
+        # cached until a highscore is saved, see `HighScore.save`, with a
+        # timeout for processes not sharing the cache
+        leaderboard = cache.get(LEADERBOARD_CACHE_KEY)
+        if leaderboard is None:
+            serializer = self.get_serializer(self.get_queryset(), many=True)
+            leaderboard = list(serializer.data)
+            cache.set(
+                LEADERBOARD_CACHE_KEY,
+                leaderboard,
+                timeout=settings.LEADERBOARD_CACHE_TIMEOUT,
+            )
+        return Response(leaderboard)
+
 
 class GamePlayViewSet(
     SerializerActionClassMixin,
+    VersionETagMixin,
     viewsets.ModelViewSet,
 ):
     """
@@ -35,10 +84,31 @@ class GamePlayViewSet(
     """
 
     serializer_class = GamePlaySerializer
-    queryset = Game.objects.all()
+    queryset = Game.objects.select_related("current_player").prefetch_related(
+        "players"
+    )
     permission_classes = [IsAuthenticated]
+    pagination_class = GameCursorPagination
 
-    serializer_action_classes = {"partial_update": GamePlayPartialUpdateSerializer}
+    serializer_action_classes = {
+        "partial_update": GamePlayPartialUpdateSerializer,
+        "bulk": GameBulkCreateSerializer,
+        "moves": GamePlayMovesSerializer,
+        "replay": GameReplaySerializer,
+        "hint": GameHintSerializer,
+        "analysis": GameAnalysisSerializer,
+    }
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == "list":
+            filters = GameFilterSerializer(data=self.request.query_params.dict())
+            filters.is_valid(raise_exception=True)
+            queryset = filters.filter_queryset(queryset)
+        elif self.action == "analysis":
+            # players are needed only to analyse the game the first time
+            queryset = queryset.prefetch_related(None).select_related("analysis")
+        return queryset
 
     @swagger_auto_schema(
         operation_description="cutomize response view in swagger for PATCH method",
@@ -75,3 +145,160 @@ class GamePlayViewSet(
     def partial_update(self, request, *args, **kwargs):
         kwargs["partial"] = True
         return self.update(request, *args, **kwargs)
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """Create games for list of pairings of players at once."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=HTTP_201_CREATED)
+
+    @action(detail=True, methods=["post"])
+    def moves(self, request, pk=None):
+        """Play list of moves at once, stopping at the first illegal one."""
+        return self.update(request, partial=True)
+
+    @action(detail=True, methods=["get"])
+    def hint(self, request, pk=None):
+        """Suggest a move to the current player."""
+        serializer = self.get_serializer(self.get_object())
+        return Response(serializer.data)
+
+    @action(detail=True, methods=["get"])
+    def analysis(self, request, pk=None):
+        """Evaluate every move of a finished game, analysed once and kept."""
+        game = self.get_object()
+        if not game.is_done:
+            raise ValidationError({"detail": _("The game is not over yet.")})
+        try:
+            analysis = game.analysis
+        except GameAnalysis.DoesNotExist:
+            analyses = GameAnalysisSerializer.analyse([game])
+            if not analyses:
+                raise ValidationError(
+                    {"detail": _("Moves of this game weren't recorded.")}
+                )
+            [analysis] = analyses
+        return Response(self.get_serializer(analysis).data)
+
+    @action(detail=True, methods=["post"])
+    def replay(self, request, pk=None):
+        """Replay moves of the game, or the given ones, into a fresh game."""
+        context = self.get_serializer_context()
+        context["game"] = self.get_object()
+        serializer = self.get_serializer(data=request.data, context=context)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=HTTP_201_CREATED)
+
+
+class MatchmakingViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    API endpoint that allows players to wait for an opponent of similar
+    rating, read whether they were matched, and leave the queue.
+    """
+
+    serializer_class = MatchRequestSerializer
+    queryset = MatchRequest.objects.all()
+    permission_classes = [IsAuthenticated]
+
+    def get_object(self):
+        match_request = (
+            self.get_queryset().filter(player__user=self.request.user).first()
+        )
+        if match_request is None:
+            raise NotFound(_("You aren't waiting for a game."))
+        return match_request
+
+    def perform_destroy(self, instance):
+        matchmaking.MATCHMAKER.remove(instance.player_id)
+        instance.delete()
+
+
+class RequestProfileViewSet(SerializerActionClassMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint that allows staff users to read profiles of requests, see
+    `api.middleware.profiling_middleware`.
+    """
+
+    serializer_class = RequestProfileSerializer
+    queryset = RequestProfile.objects.defer("stats")
+    permission_classes = [IsAdminUser]
+    pagination_class = RequestProfileCursorPagination
+
+    serializer_action_classes = {
+        "retrieve": RequestProfileDetailSerializer,
+    }
+
+    def get_queryset(self):
+        if self.action in ("retrieve", "download"):
+            return RequestProfile.objects.all()
+        return super().get_queryset()
+
+    @action(detail=True, methods=["get"])
+    def download(self, request, pk=None):
+        """Profile in `pstats` format, e.g. for `snakeviz` or `pstats`."""
+        request_profile = self.get_object()
+        response = HttpResponse(
+            bytes(request_profile.stats), content_type="application/octet-stream"
+        )
+        response["Content-Disposition"] = 'attachment; filename="profile-{}.prof"'.format(
+            request_profile.id
+        )
+        return response
+
+
+def is_authenticated(request) -> bool:
+    """Authenticate plain Django request the same way as REST API views."""
+    return requesting_user(request).is_authenticated
+
+
+async def wait_for_move(request, pk):
+    """
+    Long poll for clients which can't keep websocket open. Respond with state
+    of the game as soon as its version is greater than `after_version`, or with
+    204 after `timeout` seconds. Waiting costs no worker thread when served by
+    ASGI server, it's woken by the move itself, see `api.events`.
+    """
+    if not await sync_to_async(is_authenticated)(request):
+        return JsonResponse(
+            {"detail": _("Authentication credentials were not provided.")},
+            status=HTTP_401_UNAUTHORIZED,
+        )
+    try:
+        after_version = int(request.GET.get("after_version", 0))
+        timeout = min(
+            float(request.GET.get("timeout", settings.LONG_POLL_TIMEOUT)),
+            settings.LONG_POLL_TIMEOUT,
+        )
+    except ValueError:
+        return JsonResponse(
+            {"detail": _("after_version and timeout must be numbers.")},
+            status=HTTP_400_BAD_REQUEST,
+        )
+
+    # subscribe before reading the state, so no move is missed in between
+    subscription = get_backend().subscribe(int(pk))
+    try:
+        state = await sync_to_async(load_game_state)(int(pk))
+        if state is None:
+            return JsonResponse({"detail": _("Not found.")}, status=HTTP_404_NOT_FOUND)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while state["version"] <= after_version:
+            event = await asyncio.wait_for(
+                subscription.get(), max(deadline - loop.time(), 0)
+            )
+            if event["type"] == "move":
+                state = dict(event, type="state")
+    except asyncio.TimeoutError:
+        return HttpResponse(status=HTTP_204_NO_CONTENT)
+    finally:
+        subscription.close()
+    return JsonResponse(state)
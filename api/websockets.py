@@ -0,0 +1,99 @@
+"""
+Websocket endpoint pushing updates of a game: `ws/play/<id>/`.
+On connect the client gets the current state, then `move` events and
+a final `winner` or `draw` event.
+"""
+import asyncio
+import json
+import re
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.events import get_backend, load_game_state
+
+GAME_PATH = re.compile(r"^/ws/play/(?P<pk>\d+)/?$")
+
+# close codes from the private range of websocket protocol
+CLOSE_NOT_FOUND = 4404
+CLOSE_UNAUTHORIZED = 4401
+
+
+def authenticate(scope) -> bool:
+    """Check user of JWT or session cookie, as REST API does."""
+    cookie = SimpleCookie()
+    for name, value in scope.get("headers", []):
+        if name == b"cookie":
+            cookie.load(value.decode("latin1"))
+
+    jwt_cookie = cookie.get(settings.JWT_AUTH_COOKIE)
+    if jwt_cookie:
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+        from rest_framework_simplejwt.exceptions import TokenError
+
+        authentication = JWTAuthentication()
+        try:
+            token = authentication.get_validated_token(jwt_cookie.value)
+            return authentication.get_user(token).is_active
+        # invalid tokens as well as users deleted or deactivated since
+        except (AuthenticationFailed, TokenError):
+            pass
+
+    session_cookie = cookie.get(settings.SESSION_COOKIE_NAME)
+    if session_cookie:
+        engine = import_module(settings.SESSION_ENGINE)
+        request = SimpleNamespace(session=engine.SessionStore(session_cookie.value))
+        return get_user(request).is_authenticated
+    return False
+
+
+async def game_updates(scope, receive, send) -> None:
+    """ASGI application serving websocket connections of games."""
+    message = await receive()
+    if message["type"] != "websocket.connect":
+        return
+    match = GAME_PATH.match(scope["path"])
+    if match is None:
+        await send({"type": "websocket.close", "code": CLOSE_NOT_FOUND})
+        return
+    if not await sync_to_async(authenticate)(scope):
+        await send({"type": "websocket.close", "code": CLOSE_UNAUTHORIZED})
+        return
+
+    # subscribe before reading the state, so no move is missed in between
+    subscription = get_backend().subscribe(int(match["pk"]))
+    try:
+        state = await sync_to_async(load_game_state)(int(match["pk"]))
+        if state is None:
+            await send({"type": "websocket.close", "code": CLOSE_NOT_FOUND})
+            return
+        await send({"type": "websocket.accept"})
+        await send({"type": "websocket.send", "text": json.dumps(state)})
+
+        next_message = asyncio.ensure_future(receive())
+        next_event = asyncio.ensure_future(subscription.get())
+        try:
+            while True:
+                done, _pending = await asyncio.wait(
+                    {next_message, next_event}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if next_event in done:
+                    await send(
+                        {"type": "websocket.send", "text": json.dumps(next_event.result())}
+                    )
+                    next_event = asyncio.ensure_future(subscription.get())
+                if next_message in done:
+                    if next_message.result()["type"] == "websocket.disconnect":
+                        break
+                    # messages from clients are ignored, moves go through REST API
+                    next_message = asyncio.ensure_future(receive())
+        finally:
+            next_message.cancel()
+            next_event.cancel()
+    finally:
+        subscription.close()
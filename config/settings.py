@@ -54,11 +54,13 @@ INSTALLED_APPS = [
 SITE_ID = 1
 
 MIDDLEWARE = [
+    "api.middleware.metrics_middleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "api.middleware.profiling_middleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -96,6 +98,77 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+# Local memory cache is per process: with many worker processes use a shared one,
+# e.g. Redis, or the leaderboard of other processes is refreshed only after
+# LEADERBOARD_CACHE_TIMEOUT seconds
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+LEADERBOARD_CACHE_TIMEOUT = 60
+
+# Game updates pushed to websockets, see `api.events`. For many processes use
+# "api.events.RedisGameEventsBackend" with GAME_EVENTS_REDIS_URL.
+GAME_EVENTS_BACKEND = "api.events.LocalGameEventsBackend"
+
+# Longest time in seconds a client waits for a move, see `api.views.wait_for_move`
+LONG_POLL_TIMEOUT = 30
+
+# Largest board games can be created with, tables of winning lines grow with it
+MAX_BOARD_SIZE = 100
+
+# Computer player, see `api.engine.search.best_move`: its account and the time
+# in seconds it may think over a move on boards too big to be solved exactly
+AI_PLAYER_EMAIL = "computer@tictactoe.local"
+AI_MOVE_TIME_BUDGET = 0.1
+
+# 3x3 tablebase written by `manage.py build_tablebase`, moves are searched without it
+TABLEBASE_PATH = BASE_DIR / "data" / "tablebase3.bin"
+
+# Size of the pool of worker processes every server process keeps for engine jobs,
+# see `api.engine.pool` (None: one per CPU)
+ENGINE_POOL_SIZE = None
+
+# Boards from that size on are played by Monte Carlo tree search, see `api.engine.mcts`,
+# with simulations split among worker processes of the pool (None: all of them),
+# each stopping after MCTS_TIME_BUDGET seconds
+MCTS_MIN_BOARD_SIZE = 10
+MCTS_SIMULATIONS = 2000
+MCTS_WORKERS = None
+MCTS_TIME_BUDGET = 0.5
+
+# Post-game analysis, see `api.engine.analysis`: plies searched on boards bigger
+# than 3x3 and worker processes of the pool evaluating moves (None: all of them)
+ANALYSIS_DEPTH = 2
+ANALYSIS_WORKERS = None
+
+# Metrics at /metrics, see `api.metrics`. With many worker processes set a directory
+# shared by them, every process dumps its samples there each METRICS_FLUSH_INTERVAL
+# seconds. None keeps the samples of each process to itself. Files not updated for
+# METRICS_FILE_RETENTION seconds, mostly of exited processes, are removed.
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 1.0
+METRICS_FILE_RETENTION = 3600
+# Metrics are served to these client addresses, or to scrapers sending
+# `Authorization: Bearer <METRICS_TOKEN>` when it's set
+METRICS_ALLOWED_IPS = ("127.0.0.1", "::1")
+METRICS_TOKEN = None
+
+# Players waiting for a game are queued by rating buckets of this width, and
+# accept opponents within one of the bands, see `api.matchmaking`
+MATCHMAKING_BUCKET_WIDTH = 50
+MATCHMAKING_RATING_BANDS = (50, 100, 200, 400, 800)
+MATCHMAKING_DEFAULT_RATING_BAND = 200
+
+# Fraction of requests profiled besides the ones asked for by staff users with
+# the X-Profile header or `profile` query parameter, see `api.profiling`
+PROFILING_SAMPLE_RATE = 0.0
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -18,9 +18,12 @@ from django.conf.urls import include
 from django.urls import re_path
 from django.contrib import admin
 
+from api.metrics import metrics_view
+
 
 urlpatterns = [
     re_path(r"^admin/", admin.site.urls),
     re_path(r"^api/", include("api.urls"), name="api"),
+    re_path(r"^metrics$", metrics_view, name="metrics"),
     re_path("", include("api.api_doc_url"), name="api-doc"),
 ]